@@ -0,0 +1,140 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+import socketserver
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+__all__ = ["StandInRegistry"]
+
+REGISTRATION_PATH = re.compile(r'^/v0/streams/([^/]+)/(consumers|producers)/([^/]+)/regions/([^/]+)$')
+SUBJECT_PATH = re.compile(r'^/subjects/([^/]+)/versions$')
+SCHEMA_PATH = re.compile(r'^/schemas/ids/(\d+)$')
+
+
+class StandInRegistry(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    An in process stream registry that registers every client of every stream, the topic of a stream is its name.
+    It also implements the subset of the Confluent schema registry API used by the AVRO clients, so the registrations
+    point the schema registry at the same server. The benchmarks and the tests of the registry client share it.
+
+    :param bootstrap_servers: the bootstrap servers returned in every registration
+    :param latency: the number of seconds each registration takes
+    :param script: a list of (status, delay) tuples, each registration request is answered with the status of the next
+                   one after sleeping its delay, the last one is repeated. Overrides `latency` when given.
+    """
+    daemon_threads = True
+
+    def __init__(self, bootstrap_servers: str = '127.0.0.1:9092', latency: float = 0.0, script=None):
+        self.bootstrap_servers = bootstrap_servers
+        self.latency = latency
+        self.script = list(script or [])
+        self.calls = 0
+        self.registrations = 0
+        self.schemas = []
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self._thread = threading.Thread(target=self.serve_forever, name='stand-in-registry', daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def registry_config(self, **settings):
+        """Returns a registry configuration pointing at this server"""
+        config = {'base_url': self.base_url, 'region': 'local', 'app_name': 'benchmark'}
+        config.update(settings)
+        return config
+
+    def next_step(self):
+        """Returns the (status, delay) of the next registration request"""
+        with self.lock:
+            self.calls += 1
+            if not self.script:
+                return 200, self.latency
+            return self.script[min(self.calls, len(self.script)) - 1]
+
+    def registration(self, stream_name: str):
+        with self.lock:
+            self.registrations += 1
+        return {'regionStreamConfigList': [{
+            'region': 'local',
+            'topics': [stream_name],
+            'streamConfiguration': {'bootstrap.servers': self.bootstrap_servers,
+                                    'schema.registry.url': self.base_url},
+        }]}
+
+    def register_schema(self, schema: str):
+        with self.lock:
+            if schema not in self.schemas:
+                self.schemas.append(schema)
+            return self.schemas.index(schema) + 1
+
+    def schema(self, schema_id: int):
+        with self.lock:
+            if 0 < schema_id <= len(self.schemas):
+                return self.schemas[schema_id - 1]
+            return None
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_PUT(self):
+        self._read_body()
+        match = REGISTRATION_PATH.match(self.path)
+        if match is None:
+            return self._reply(404, {'message': 'Not found'})
+        status, delay = self.server.next_step()
+        if delay:
+            time.sleep(delay)
+        if status != 200:
+            return self._reply(status, {'message': 'Scripted failure'})
+        self._reply(200, self.server.registration(match.group(1)))
+
+    def do_POST(self):
+        body = self._read_body()
+        if SUBJECT_PATH.match(self.path) is None:
+            return self._reply(404, {'error_code': 404, 'message': 'Not found'})
+        self._reply(200, {'id': self.server.register_schema(json.loads(body)['schema'])})
+
+    def do_GET(self):
+        match = SCHEMA_PATH.match(self.path)
+        schema = self.server.schema(int(match.group(1))) if match else None
+        if schema is None:
+            return self._reply(404, {'error_code': 40403, 'message': 'Schema not found'})
+        self._reply(200, {'schema': schema})
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, status, document):
+        body = json.dumps(document).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
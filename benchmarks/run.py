@@ -0,0 +1,323 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks of the client against a stand-in stream registry and librdkafka's mock cluster, no network access or
+Kafka installation is needed:
+
+    python -m benchmarks.run --output results.json
+
+Every run writes one JSON document with the environment, the parameters and the results so two versions can be
+compared with `--compare previous.json`.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+import uuid
+
+import confluent_kafka
+from confluent_kafka import Producer
+from confluent_kafka.avro import CachedSchemaRegistryClient
+import logzero
+from logzero import logger
+
+import stream_registry_python_client.consumer.builder as consumer_builder
+import stream_registry_python_client.producer.builder as producer_builder
+import stream_registry_python_client.producer.avro_encoder as avro_encoder
+from stream_registry_python_client.consumer.avro_decoder import AvroBatchDecoder
+from stream_registry_python_client.consumer.stream import consume_batches
+from stream_registry_python_client.restclient import RegistryClient
+
+from benchmarks.registry import StandInRegistry
+
+__all__ = ["MockCluster", "BENCHMARKS", "run", "main"]
+
+KEY_SCHEMA = json.dumps({'type': 'record', 'name': 'Key', 'fields': [{'name': 'id', 'type': 'long'}]})
+VALUE_SCHEMA = json.dumps({'type': 'record', 'name': 'Value', 'fields': [
+    {'name': 'id', 'type': 'long'},
+    {'name': 'name', 'type': 'string'},
+    {'name': 'amount', 'type': 'double'},
+    {'name': 'tags', 'type': {'type': 'array', 'items': 'string'}},
+]})
+
+
+class MockCluster(object):
+    """
+    A librdkafka mock cluster. It lives inside a placeholder producer, its brokers listen on local ports so any
+    client created with `bootstrap_servers` can use it.
+
+    :param brokers: the number of brokers of the cluster
+    """
+
+    def __init__(self, brokers: int = 3):
+        self._owner = Producer({'test.mock.num.brokers': brokers})
+        metadata = self._owner.list_topics(timeout=10)
+        self.bootstrap_servers = ','.join('{}:{}'.format(b.host, b.port)
+                                          for _, b in sorted(metadata.brokers.items()))
+
+    def close(self):
+        self._owner.flush(1)
+        self._owner = None
+
+
+class _Message(object):
+    """The part of `confluent_kafka.Message` read by the decoder"""
+
+    def __init__(self, key, value):
+        self._key = key
+        self._value = value
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+
+def bench_registration(registry, options):
+    """Latency of a registration with a warm connection pool, uncached and cached, and of concurrent registrations"""
+    results = {}
+    with RegistryClient(registry.registry_config(retries=0)) as registry_client:
+        registry_client.register_consumer('registration')
+        results['uncached'] = _latencies(lambda: registry_client.register_consumer('registration'),
+                                         options.registrations)
+    with RegistryClient(registry.registry_config(cache_ttl=3600)) as registry_client:
+        registry_client.register_consumer('registration')
+        results['cached'] = _latencies(lambda: registry_client.register_consumer('registration'),
+                                       options.registrations)
+    with RegistryClient(registry.registry_config(retries=0)) as registry_client:
+        stream_names = ['registration-{}'.format(i) for i in range(options.registrations)]
+        start = time.perf_counter()
+        registrations, errors = registry_client.register_many(stream_names)
+        elapsed = time.perf_counter() - start
+    results['register_many'] = {'streams': len(stream_names), 'errors': len(errors), 'seconds': elapsed,
+                                'per_second': len(registrations) / elapsed}
+    return results
+
+
+def bench_startup(registry, options):
+    """Time to register and build a producer and a consumer, the registry round trip included"""
+    config = registry.registry_config()
+    producers = []
+    consumers = []
+
+    def create_producer():
+        producers.append(producer_builder.create_producer(config, 'startup')[0])
+
+    def create_consumer():
+        consumers.append(consumer_builder.create_consumer(config, 'startup', avro_consumer=False)[0])
+
+    results = {'create_producer': _latencies(create_producer, options.startups),
+               'create_consumer': _latencies(create_consumer, options.startups)}
+    for p in producers:
+        p.flush(1)
+    for c in consumers:
+        c.close()
+    return results
+
+
+def bench_produce_consume(registry, options):
+    """Throughput of a producer and a consumer created by the builders for the same stream"""
+    config = registry.registry_config()
+    stream_name = 'throughput-{}'.format(uuid.uuid4().hex[:8])
+    payload = b'x' * options.message_size
+
+    p, topic = producer_builder.create_producer(config, stream_name, {'linger.ms': 5})
+    start = time.perf_counter()
+    for i in range(options.messages):
+        while True:
+            try:
+                p.produce(topic, payload)
+                break
+            except BufferError:
+                p.poll(0.01)
+        p.poll(0)
+    remaining = p.flush(60)
+    produce_seconds = time.perf_counter() - start
+    produced = options.messages - remaining
+
+    c, _ = consumer_builder.create_consumer(config, stream_name, {'auto.offset.reset': 'earliest'},
+                                            avro_consumer=False)
+    # the group join delays the first batch, the rate is measured from the end of the first batch on
+    start = time.perf_counter()
+    first = None
+    first_batch = 0
+    consumed = 0
+    deadline = start + options.timeout
+    try:
+        for batch in consume_batches(c, max_batch_size=1000, max_wait=0.5):
+            consumed += len(batch.messages)
+            if batch.messages and first is None:
+                first = time.perf_counter()
+                first_batch = consumed
+            if consumed >= produced or time.perf_counter() > deadline:
+                break
+    finally:
+        c.close()
+    end = time.perf_counter()
+
+    return {
+        'produce': _throughput(produced, produce_seconds, options.message_size),
+        'consume': dict(_throughput(consumed - first_batch, end - (first or start), options.message_size),
+                        total_messages=consumed, first_batch_seconds=(first or end) - start),
+    }
+
+
+def bench_avro(registry, options):
+    """Rates of the batch AVRO encoder and decoder, the schema registry round trips are done before measuring"""
+    schema_registry = CachedSchemaRegistryClient({'url': registry.base_url})
+    encoder = avro_encoder.AvroBatchEncoder(schema_registry, KEY_SCHEMA, VALUE_SCHEMA)
+    records = [({'id': i}, {'id': i, 'name': 'name-{}'.format(i), 'amount': i * 0.5, 'tags': ['a', 'b']})
+               for i in range(options.avro_records)]
+    encoder.encode_batch('avro', records[:1])
+
+    start = time.perf_counter()
+    encoded = encoder.encode_batch('avro', records)
+    encode_seconds = time.perf_counter() - start
+
+    decoder = AvroBatchDecoder(schema_registry)
+    messages = [_Message(key, value) for key, value in encoded]
+    decoder.decode_batch(messages[:1])
+    start = time.perf_counter()
+    decoded = decoder.decode_batch(messages)
+    decode_seconds = time.perf_counter() - start
+    decoder.close()
+    if decoded[-1] != records[-1]:
+        raise AssertionError("The decoded records do not match the encoded ones")
+
+    size = sum(len(key) + len(value) for key, value in encoded) // max(1, len(encoded))
+    return {'fastavro': avro_encoder.HAS_FAST,
+            'encode': _throughput(len(records), encode_seconds, size),
+            'decode': _throughput(len(records), decode_seconds, size)}
+
+
+BENCHMARKS = {
+    'registration': bench_registration,
+    'startup': bench_startup,
+    'produce_consume': bench_produce_consume,
+    'avro': bench_avro,
+}
+
+
+def run(options):
+    """
+    Start the stand-in registry and the mock cluster, then run the selected benchmarks.
+
+    :param options: the parsed command line options
+    :return: the report as a dict
+    """
+    cluster = MockCluster(options.brokers)
+    registry = StandInRegistry(cluster.bootstrap_servers, options.registry_latency)
+    results = {}
+    try:
+        for name in options.benchmarks:
+            logger.info("Running benchmark {}".format(name))
+            results[name] = BENCHMARKS[name](registry, options)
+    finally:
+        registry.close()
+        cluster.close()
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'confluent_kafka': confluent_kafka.__version__,
+            'librdkafka': confluent_kafka.libversion()[0],
+        },
+        'parameters': {k: v for k, v in vars(options).items() if k not in ('output', 'compare', 'verbose')},
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'results': results,
+    }
+
+
+def compare(previous, current, prefix=''):
+    """
+    Returns the relative change of every number found in both result trees, keyed by its dotted path.
+    """
+    changes = {}
+    for key, value in current.items():
+        path = prefix + key
+        if key not in previous:
+            continue
+        if isinstance(value, dict) and isinstance(previous[key], dict):
+            changes.update(compare(previous[key], value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and \
+                isinstance(previous[key], (int, float)) and previous[key]:
+            changes[path] = (value - previous[key]) / float(previous[key])
+    return changes
+
+
+def main(args=None):
+    """
+    Command line entry point:
+
+        python -m benchmarks.run --output results.json --compare previous.json
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the stream registry client offline")
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS),
+                        help="The benchmarks to run, all of them by default")
+    parser.add_argument('--brokers', type=int, default=3, help="The number of brokers of the mock cluster")
+    parser.add_argument('--registry-latency', type=float, default=0.0,
+                        help="Seconds the stand-in registry waits before answering a registration")
+    parser.add_argument('--registrations', type=int, default=200, help="The number of registrations to time")
+    parser.add_argument('--startups', type=int, default=10, help="The number of producers and consumers to create")
+    parser.add_argument('--messages', type=int, default=100000, help="The number of messages to produce and consume")
+    parser.add_argument('--message-size', type=int, default=100, help="The size in bytes of the produced messages")
+    parser.add_argument('--avro-records', type=int, default=20000, help="The number of records to encode and decode")
+    parser.add_argument('--timeout', type=float, default=60.0, help="The maximum number of seconds to consume")
+    parser.add_argument('--output', help="The file the JSON report is written to, stdout by default")
+    parser.add_argument('--compare', help="A previous JSON report to compare the results with")
+    parser.add_argument('--verbose', action='store_true', help="Log at debug level")
+    options = parser.parse_args(args)
+    logzero.loglevel(logging.DEBUG if options.verbose else logging.INFO)
+
+    report = run(options)
+    if options.compare:
+        with open(options.compare) as f:
+            report['changes'] = compare(json.load(f)['results'], report['results'])
+    document = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(document + '\n')
+        logger.info("Benchmark report written to {}".format(options.output))
+    else:
+        sys.stdout.write(document + '\n')
+    return report
+
+
+def _latencies(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'count': len(samples),
+        'mean_ms': 1000 * sum(samples) / len(samples),
+        'p50_ms': 1000 * samples[len(samples) // 2],
+        'p99_ms': 1000 * samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'max_ms': 1000 * samples[-1],
+    }
+
+
+def _throughput(count: int, seconds: float, size: int):
+    seconds = max(seconds, 1e-9)
+    return {'messages': count, 'seconds': seconds, 'messages_per_second': count / seconds,
+            'mb_per_second': count * size / seconds / 1e6}
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,7 @@ setup(
         'Programming Language :: Python :: 3.7',
     ],
     description="Stream registry client for python",
+    extras_require={'fast': ['fastavro']},
     install_requires=install_require,
     long_description="foobar",
     include_package_data=True,
@@ -0,0 +1,119 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from logzero import logger
+from typing import Tuple
+
+__all__ = ["RegistrationCache"]
+
+DEFAULT_TTL = 300.0
+
+
+class RegistrationCache(object):
+    """
+    A cache of stream registry registration responses. Entries are memoized in memory and, when a directory is given,
+    persisted to disk so a restarted process can bootstrap its clients without waiting on the registry. Entries older
+    than the TTL are not served as fresh but are kept around so they can be used as a fallback when the registry fails.
+
+    :param directory: the directory to persist the entries to, if None the cache is memory only
+    :param ttl: the number of seconds an entry is considered fresh
+    """
+
+    def __init__(self, directory: str = None, ttl: float = DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = float(ttl)
+        self._entries = {}
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: Tuple[str, ...], allow_stale: bool = False):
+        """
+        Look up a registration.
+
+        :param key: the (base_url, stream, app, region, role) tuple that identifies the registration
+        :param allow_stale: if True an entry is returned even when it is older than the TTL
+        :return: the cached registration or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            with self._lock:
+                self._entries[key] = entry
+        stored_at, registration = entry
+        if not allow_stale and time.time() - stored_at > self.ttl:
+            return None
+        return registration
+
+    def put(self, key: Tuple[str, ...], registration):
+        """
+        Store a registration, the file on disk is replaced atomically so concurrent readers never see a partial entry.
+
+        :param key: the (base_url, stream, app, region, role) tuple that identifies the registration
+        :param registration: the registration response as returned by the registry
+        """
+        stored_at = time.time()
+        with self._lock:
+            self._entries[key] = (stored_at, registration)
+        if self.directory is None:
+            return
+        path = self._path(key)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': list(key), 'stored_at': stored_at, 'registration': registration}, f)
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Unable to persist the registration cache entry {}: {}".format(path, e))
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Drop the in memory entries, the entries persisted on disk are left untouched"""
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, key: Tuple[str, ...]):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable registration cache entry {}: {}".format(path, e))
+            return None
+        if data.get('key') != list(key):
+            return None
+        return data['stored_at'], data['registration']
+
+    def _path(self, key: Tuple[str, ...]):
+        digest = hashlib.sha256(json.dumps(list(key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, "{}.json".format(digest))
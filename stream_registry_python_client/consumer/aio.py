@@ -0,0 +1,74 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["AsyncConsumer"]
+
+DEFAULT_POLL_TIMEOUT = 1.0
+
+
+class AsyncConsumer(object):
+    """
+    An asyncio facade over a Kafka consumer. The blocking calls run on a single dedicated thread, which also keeps
+    every call to the consumer on the same thread, and messages are read with `async for`:
+
+        async for msg in consumer:
+            if msg.error():
+                ...
+
+    :param consumer: the underlying Kafka consumer
+    :param loop: the event loop to run on, defaults to the current event loop
+    :param poll_timeout: the maximum time of each poll, the iterator keeps polling until a message arrives
+    """
+
+    def __init__(self, consumer, loop=None, poll_timeout: float = DEFAULT_POLL_TIMEOUT):
+        self.consumer = consumer
+        self.loop = loop or asyncio.get_event_loop()
+        self.poll_timeout = poll_timeout
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._closed = False
+
+    async def poll(self, timeout: float = None):
+        """Poll one message, returns None if nothing arrived within the timeout"""
+        return await self._run(self.consumer.poll, self.poll_timeout if timeout is None else timeout)
+
+    async def consume(self, num_messages: int = 1, timeout: float = None):
+        """Consume a list of up to `num_messages` messages, see `Consumer.consume`"""
+        return await self._run(self.consumer.consume, num_messages, self.poll_timeout if timeout is None else timeout)
+
+    async def commit(self, *args, **kwargs):
+        """Commit offsets, see `Consumer.commit`"""
+        return await self._run(lambda: self.consumer.commit(*args, **kwargs))
+
+    async def close(self):
+        """Close the consumer, any pending iteration ends"""
+        if self._closed:
+            return
+        self._closed = True
+        await self._run(self.consumer.close)
+        self._executor.shutdown(wait=False)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._closed:
+            msg = await self._run(self.consumer.poll, self.poll_timeout)
+            if msg is not None:
+                return msg
+        raise StopAsyncIteration
+
+    async def _run(self, fn, *args):
+        return await self.loop.run_in_executor(self._executor, fn, *args)
@@ -0,0 +1,161 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import struct
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from logzero import logger
+
+import avro.io
+import avro.schema
+
+try:
+    from fastavro import parse_schema, schemaless_reader
+    HAS_FAST = True
+except ImportError:
+    HAS_FAST = False
+
+__all__ = ["AvroBatchDecoder", "AvroDecodeError"]
+
+MAGIC_BYTE = 0
+HEADER_SIZE = 5
+MIN_CHUNK_SIZE = 256
+
+# compiled readers by writer schema text, kept per process so pool workers compile a schema only once
+__readers = {}
+__readers_lock = threading.Lock()
+
+
+class AvroDecodeError(Exception):
+    """Raised when a payload is not a schema registry framed Avro message"""
+    pass
+
+
+class AvroBatchDecoder(object):
+    """
+    Decodes schema registry framed Avro messages a batch at a time. The writer schema of each schema id is fetched
+    once and compiled into a reader that is reused for every message written with it, `fastavro` is used when it is
+    installed. With `workers` > 0 big batches are split in contiguous chunks decoded by a process pool, the results
+    keep the order of the batch so the per partition order of the messages is preserved.
+
+    :param schema_registry: a schema registry client with a `get_by_id` method, usually a
+                            `confluent_kafka.avro.CachedSchemaRegistryClient`
+    :param workers: the number of decoding processes, 0 (default) decodes in the calling thread
+    :param decode_keys: if True (default) keys are decoded as well, otherwise they are returned as is
+    """
+
+    def __init__(self, schema_registry, workers: int = 0, decode_keys: bool = True):
+        self.schema_registry = schema_registry
+        self.workers = workers
+        self.decode_keys = decode_keys
+        self._schemas = {}
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+    def decode(self, payload: bytes):
+        """Decode a single key or value, None (tombstones or missing keys) is returned as None"""
+        if payload is None:
+            return None
+        return _decode(self._schema_text(_schema_id(payload)), payload)
+
+    def decode_batch(self, messages):
+        """
+        Decode the keys and values of a list of messages.
+
+        :param messages: the messages to decode, usually `Batch.messages`
+        :return: a list with the (key, value) of every message in the same order as `messages`
+        """
+        payloads = []
+        schemas = {}
+        for msg in messages:
+            key = msg.key()
+            value = msg.value()
+            for payload in (key, value) if self.decode_keys else (value,):
+                if payload is not None:
+                    schema_id = _schema_id(payload)
+                    if schema_id not in schemas:
+                        schemas[schema_id] = self._schema_text(schema_id)
+            payloads.append((key, value))
+
+        if self._executor is None or len(payloads) < 2 * MIN_CHUNK_SIZE:
+            return _decode_chunk(schemas, payloads, self.decode_keys)
+
+        chunk_size = max(MIN_CHUNK_SIZE, -(-len(payloads) // self.workers))
+        chunks = [payloads[i:i + chunk_size] for i in range(0, len(payloads), chunk_size)]
+        decoded = []
+        for result in self._executor.map(_decode_chunk, [schemas] * len(chunks), chunks,
+                                         [self.decode_keys] * len(chunks)):
+            decoded.extend(result)
+        return decoded
+
+    def close(self):
+        """Shut the decoding processes down"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _schema_text(self, schema_id: int):
+        with self._lock:
+            schema_text = self._schemas.get(schema_id)
+        if schema_text is None:
+            schema = self.schema_registry.get_by_id(schema_id)
+            if schema is None:
+                raise AvroDecodeError("Unable to fetch schema with id {}".format(schema_id))
+            schema_text = str(schema)
+            with self._lock:
+                self._schemas[schema_id] = schema_text
+        return schema_text
+
+
+def _schema_id(payload: bytes):
+    if len(payload) <= HEADER_SIZE:
+        raise AvroDecodeError("message is too small to decode")
+    magic, schema_id = struct.unpack('>bI', payload[:HEADER_SIZE])
+    if magic != MAGIC_BYTE:
+        raise AvroDecodeError("message does not start with magic byte")
+    return schema_id
+
+
+def _decode_chunk(schemas, payloads, decode_keys):
+    """Decode a list of (key, value) payloads, schemas maps the schema ids to their text. Runs in pool workers"""
+    decoded = []
+    for key, value in payloads:
+        if decode_keys and key is not None:
+            key = _decode(schemas[_schema_id(key)], key)
+        if value is not None:
+            value = _decode(schemas[_schema_id(value)], value)
+        decoded.append((key, value))
+    return decoded
+
+
+def _decode(schema_text: str, payload: bytes):
+    reader = __readers.get(schema_text)
+    if reader is None:
+        reader = _compile_reader(schema_text)
+        with __readers_lock:
+            __readers[schema_text] = reader
+    return reader(io.BytesIO(payload[HEADER_SIZE:]))
+
+
+def _compile_reader(schema_text: str):
+    if HAS_FAST:
+        try:
+            fast_schema = parse_schema(json.loads(schema_text))
+            return lambda stream: schemaless_reader(stream, fast_schema)
+        except Exception as e:
+            logger.warning("fastavro could not compile the schema, falling back to avro: {}".format(e))
+
+    datum_reader = avro.io.DatumReader(avro.schema.parse(schema_text))
+    return lambda stream: datum_reader.read(avro.io.BinaryDecoder(stream))
@@ -10,18 +10,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import json
+
 from logzero import logger
 from typing import Dict
 from confluent_kafka import Consumer
-from confluent_kafka.avro import AvroConsumer
+from confluent_kafka.avro import AvroConsumer, CachedSchemaRegistryClient
 
 import stream_registry_python_client.restclient as client
+from stream_registry_python_client import metrics
+from stream_registry_python_client.consumer.aio import AsyncConsumer
+from stream_registry_python_client.consumer.avro_decoder import AvroBatchDecoder
+from stream_registry_python_client.consumer.commit import CommitManager
+from stream_registry_python_client.consumer.multiplex import MultiplexedConsumer
+from stream_registry_python_client.region import select_region_config
+from stream_registry_python_client.watcher import default_watcher, WatchedConsumer
 
-__all__ = ["create_consumer"]
+__all__ = ["create_consumer", "create_consumer_async", "create_consumers", "create_managed_consumer",
+           "create_multiplexed_consumers", "create_fast_avro_consumer"]
 
 
 def create_consumer(registry_config: Dict[str, str], stream_name: str, kafka_properties: Dict[str, str] = None,
-                    avro_consumer: bool = True, auto_subscribe: bool = True):
+                    avro_consumer: bool = True, auto_subscribe: bool = True, watch_topology: bool = False):
     """
     Creates a High level kafka consumer for the desired stream. This method will talk to the stream registry to
     register the consumer based on the registry configuration passed and will optionally auto subscribe the consumer
@@ -39,35 +50,232 @@ def create_consumer(registry_config: Dict[str, str], stream_name: str, kafka_pro
     :param avro_consumer: If True (default) an AVRO consumer will be created
     :param auto_subscribe: if True (default) the consumer.subscribe method will be invoked for all the topics that
                            represent the stream.
+    :param watch_topology: if True the shared `watcher.default_watcher` resubscribes the consumer whenever the
+                           registry adds or removes topics of the stream. Requires `auto_subscribe`. The consumer is
+                           then returned as a `watcher.WatchedConsumer` whose `close` also stops the watch.
     :return: a tuple of the consumer and an array of topics. If `auto_subscribe` was set to True (default) the consumer
             would be subscribed already and is ready to start consuming/polling.
     """
-    registration = client.register_consumer(registry_config, stream_name)
-    if registration is None:
-        logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
-        return None
+    with metrics.timer('builder.create_consumer', stream=stream_name):
+        registration = client.register_consumer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None
+        c, topics = __consumer_from_registration(registry_config, registration, kafka_properties, avro_consumer,
+                                                 auto_subscribe)
+    if watch_topology and auto_subscribe:
+        watch = default_watcher.watch_consumer(c, registry_config, stream_name, registration)
+        c = WatchedConsumer(c, default_watcher, watch)
+    return c, topics
+
+
+def create_managed_consumer(registry_config: Dict[str, str], stream_name: str, kafka_properties: Dict[str, str] = None,
+                            avro_consumer: bool = True, commit_every: int = 1000, commit_interval: float = 5.0):
+    """
+    Creates a consumer whose offsets are committed by a :class:`CommitManager` instead of librdkafka's auto commit.
+    Read with `manager.poll` (or `manager.consume`), call `manager.done(msg)` once a message is processed (in any
+    order) and `manager.close()` to commit the last offsets and close the consumer.
+
+    :param dict registry_config: Config parameters, see :func:`create_consumer`
+    :param stream_name: The name of the stream to consume.
+    :param kafka_properties: any kafka consumer properties which will be merged with the default from the stream
+                             registry. 'enable.auto.commit' is always disabled.
+    :param avro_consumer: If True (default) an AVRO consumer will be created
+    :param commit_every: the number of processed messages that triggers an asynchronous commit
+    :param commit_interval: the maximum number of seconds between two commits
+    :return: a tuple of the consumer, an array of topics and the :class:`CommitManager`, the consumer is already
+             subscribed.
+    """
+    with metrics.timer('builder.create_managed_consumer', stream=stream_name):
+        registration = client.register_consumer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None
+        # forced after the registry configuration is merged, at-least-once delivery depends on it
+        c, topics = __consumer_from_registration(registry_config, registration, kafka_properties, avro_consumer, False,
+                                                 overrides={'enable.auto.commit': False})
+        manager = CommitManager(c, commit_every, commit_interval)
+        manager.subscribe(topics)
+        return c, topics, manager
+
+
+async def create_consumer_async(registry_config: Dict[str, str], stream_name: str,
+                                kafka_properties: Dict[str, str] = None, avro_consumer: bool = True,
+                                auto_subscribe: bool = True, loop=None):
+    """
+    The asyncio version of :func:`create_consumer`. The registration does not block the event loop and the consumer
+    is wrapped in an :class:`AsyncConsumer` that can be read with `async for`.
+
+    :param dict registry_config: Config parameters, see :func:`create_consumer`
+    :param stream_name: The name of the stream to consume.
+    :param kafka_properties: any kafka consumer properties which will be merged with the default from the stream
+                             registry.
+    :param avro_consumer: If True (default) an AVRO consumer will be created
+    :param auto_subscribe: if True (default) the consumer will be subscribed to all the topics of the stream.
+    :param loop: the event loop to use, defaults to the current event loop
+    :return: a tuple of the :class:`AsyncConsumer` and an array of topics
+    """
+    with metrics.timer('builder.create_consumer_async', stream=stream_name):
+        loop = loop or asyncio.get_event_loop()
+        registration = await loop.run_in_executor(None, client.register_consumer, registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None
+        c, topics = __consumer_from_registration(registry_config, registration, kafka_properties, avro_consumer,
+                                                 auto_subscribe)
+        return AsyncConsumer(c, loop), topics
+
+
+def create_fast_avro_consumer(registry_config: Dict[str, str], stream_name: str,
+                              kafka_properties: Dict[str, str] = None, auto_subscribe: bool = True,
+                              decode_workers: int = 0):
+    """
+    Creates a consumer for an AVRO stream that leaves the decoding to an :class:`AvroBatchDecoder`. Instead of
+    decoding every message inside `poll` like the `AvroConsumer` does, whole batches are decoded in one call with a
+    reader compiled once per schema id, optionally spread over a pool of processes. Pair it with
+    `consumer.stream.consume_batches(consumer, decode=decoder.decode_batch)`.
+
+    :param dict registry_config: Config parameters, see :func:`create_consumer`
+    :param stream_name: The name of the stream to consume.
+    :param kafka_properties: any kafka consumer properties which will be merged with the default from the stream
+                             registry.
+    :param auto_subscribe: if True (default) the consumer will be subscribed to all the topics of the stream.
+    :param decode_workers: the number of processes used to decode big batches, 0 (default) decodes in process
+    :return: a tuple of the consumer, the array of topics and the decoder
+    """
+    with metrics.timer('builder.create_fast_avro_consumer', stream=stream_name):
+        registration = client.register_consumer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None
+
+        region_config = select_region_config(registration, registry_config)
+        properties = __consumer_properties(registry_config, region_config, kafka_properties)
+        decoder = AvroBatchDecoder(CachedSchemaRegistryClient(properties['schema.registry.url']), decode_workers)
+        c = __build_highlevel_consumer(properties)
+
+        topics = region_config['topics']
+        if auto_subscribe:
+            c.subscribe(topics)
+        return c, topics, decoder
+
+
+def create_consumers(registry_config: Dict[str, str], stream_names, kafka_properties: Dict[str, str] = None,
+                     avro_consumer: bool = True, auto_subscribe: bool = True, max_workers: int = None):
+    """
+    Creates one High level kafka consumer per stream. The registrations to the stream registry are issued
+    concurrently so the time to start many consumers is bound by the slowest registration instead of the sum of them.
+
+    :param dict registry_config: Config parameters, see :func:`create_consumer`
+    :param stream_names: the names of the streams to consume.
+    :param kafka_properties: any kafka consumer properties which will be merged with the default from the stream
+                             registry, these are applied to every consumer.
+    :param avro_consumer: If True (default) AVRO consumers will be created
+    :param auto_subscribe: if True (default) every consumer will be subscribed to the topics of its stream.
+    :param max_workers: the maximum number of concurrent registrations
+    :return: a tuple of two dicts, the first maps each stream name to its (consumer, topics) tuple and the second maps
+             the stream names that could not be created to the error that caused it.
+    """
+    with metrics.timer('builder.create_consumers'):
+        registrations, errors = client.register_many(registry_config, stream_names, client.CONSUMER_ROLE, max_workers)
+        consumers = {}
+        for stream_name, registration in registrations.items():
+            try:
+                consumers[stream_name] = __consumer_from_registration(registry_config, registration, kafka_properties,
+                                                                      avro_consumer, auto_subscribe)
+            except Exception as e:
+                logger.error("Unable to create Kafka Consumer for stream {}: {}".format(stream_name, e))
+                errors[stream_name] = e
+        return consumers, errors
+
+
+def create_multiplexed_consumers(registry_config: Dict[str, str], stream_names,
+                                 kafka_properties: Dict[str, str] = None, avro_consumer: bool = True,
+                                 auto_subscribe: bool = True, max_workers: int = None):
+    """
+    Registers to several streams and creates as few consumers as possible to read them. Streams whose Kafka
+    configuration (including the group.id) is the same are read by a single consumer subscribed to the union of their
+    topics, the returned :class:`MultiplexedConsumer` knows which stream each topic belongs to so messages can be
+    dispatched to a handler per stream.
+
+    :param dict registry_config: Config parameters, see :func:`create_consumer`
+    :param stream_names: the names of the streams to consume.
+    :param kafka_properties: any kafka consumer properties which will be merged with the default from the stream
+                             registry, these are applied to every consumer.
+    :param avro_consumer: If True (default) AVRO consumers will be created
+    :param auto_subscribe: if True (default) every consumer will be subscribed to the topics of all its streams.
+    :param max_workers: the maximum number of concurrent registrations
+    :return: a tuple with the list of :class:`MultiplexedConsumer` and a dict with the errors by stream name
+    """
+    with metrics.timer('builder.create_multiplexed_consumers'):
+        registrations, errors = client.register_many(registry_config, stream_names, client.CONSUMER_ROLE, max_workers)
+        groups = {}
+        for stream_name in sorted(registrations):
+            registration = registrations[stream_name]
+            try:
+                region_config = select_region_config(registration, registry_config)
+                properties = __consumer_properties(registry_config, region_config, kafka_properties)
+                topics = region_config['topics']
+            except Exception as e:
+                logger.error("Unable to read the registration of stream {}: {}".format(stream_name, e))
+                errors[stream_name] = e
+                continue
+            key = json.dumps(properties, sort_keys=True, default=repr)
+            group = groups.setdefault(key, (properties, {}))
+            group[1][stream_name] = topics
+
+        consumers = []
+        for properties, streams in groups.values():
+            try:
+                c = __build_consumer(properties, avro_consumer)
+            except Exception as e:
+                logger.error("Unable to create Kafka Consumer for streams {}: {}".format(sorted(streams), e))
+                for stream_name in streams:
+                    errors[stream_name] = e
+                continue
+            multiplexed = MultiplexedConsumer(c, streams)
+            if auto_subscribe:
+                multiplexed.subscribe()
+            consumers.append(multiplexed)
+        return consumers, errors
 
+
+def __consumer_from_registration(registry_config: Dict[str, str], registration, kafka_properties: Dict[str, str],
+                                 avro_consumer: bool, auto_subscribe: bool, overrides: Dict[str, str] = None):
+    """ Build and optionally subscribe the consumer described by a stream registry registration"""
+
+    region_config = select_region_config(registration, registry_config)
+    properties = __consumer_properties(registry_config, region_config, kafka_properties)
+    properties.update(overrides or {})
+    c = __build_consumer(properties, avro_consumer)
+
+    topics = region_config['topics']
+    if auto_subscribe:
+        c.subscribe(topics)
+    return c, topics
+
+
+def __consumer_properties(registry_config: Dict[str, str], region_config, kafka_properties: Dict[str, str]):
     """Traverse the JSON object to get to the actual kafka configuration"""
-    config_element = registration['regionStreamConfigList'][0]['streamConfiguration']
+    config_element = region_config['streamConfiguration']
 
     """ Merge the configuration """
     properties = __merge_properties(config_element, kafka_properties)
+    metrics.apply_statistics(properties, registry_config)
 
     if 'group.id' not in properties:
         app_name = registry_config['app_name']
         logger.info(
             "A group id for the consumer was not specified, adding it as the application name: {}".format(app_name))
         properties['group.id'] = app_name
+    return properties
 
-    if avro_consumer:
-        c = __build_avro_consumer(properties)
-    else:
-        c = __build_highlevel_consumer(properties)
 
-    topics = registration['regionStreamConfigList'][0]['topics']
-    if auto_subscribe:
-        c.subscribe(topics)
-    return c, topics
+def __build_consumer(properties: Dict[str, str], avro_consumer: bool):
+    with metrics.timer('builder.build_consumer', avro=avro_consumer):
+        if avro_consumer:
+            return __build_avro_consumer(properties)
+        return __build_highlevel_consumer(properties)
 
 
 def __build_highlevel_consumer(kafka_config: Dict[str, str]):
@@ -80,6 +288,7 @@ def __build_highlevel_consumer(kafka_config: Dict[str, str]):
 def __build_avro_consumer(kafka_config: Dict[str, str]):
     return AvroConsumer(kafka_config)
 
+
 def __merge_properties(stream_registry_props: Dict[str, str], user_properties: Dict[str, str]):
     """ Merge stream registry configuration into kafka properties"""
     properties = {}
@@ -0,0 +1,161 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+
+from logzero import logger
+from confluent_kafka import KafkaException, TopicPartition
+
+__all__ = ["CommitManager"]
+
+DEFAULT_COMMIT_EVERY = 1000
+DEFAULT_COMMIT_INTERVAL = 5.0
+
+
+class CommitManager(object):
+    """
+    Commits the offsets of a consumer (created with 'enable.auto.commit' set to False) in batches. Messages are
+    tracked when they are read and marked as done when processed, in any order and from any thread. For every
+    partition only the highest contiguous processed offset is committed, so a crash never skips a message that was
+    still being processed (at-least-once). Commits are asynchronous and happen every `commit_every` processed
+    messages or every `commit_interval` seconds, checked when messages are processed and on every poll. Since the
+    outcome of an asynchronous commit is only known to the consumer, every processed offset is committed again
+    synchronously when partitions are revoked and on close.
+
+    :param consumer: the Kafka consumer
+    :param commit_every: the number of processed messages that triggers a commit
+    :param commit_interval: the maximum number of seconds between two commits while messages are processed
+    """
+
+    def __init__(self, consumer, commit_every: int = DEFAULT_COMMIT_EVERY,
+                 commit_interval: float = DEFAULT_COMMIT_INTERVAL):
+        self.consumer = consumer
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._in_flight = {}
+        self._done = {}
+        self._next = {}
+        self._committed = {}
+        self._since_commit = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.RLock()
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        """
+        Subscribe the consumer so the pending offsets are committed before partitions are revoked.
+
+        :param topics: the topics to subscribe to
+        :param on_assign: an optional callback, see `Consumer.subscribe`
+        :param on_revoke: an optional callback invoked after the revoked partitions were committed
+        """
+        def revoke(consumer, partitions):
+            self._on_revoke(partitions)
+            if on_revoke is not None:
+                on_revoke(consumer, partitions)
+
+        if on_assign is not None:
+            self.consumer.subscribe(topics, on_assign=on_assign, on_revoke=revoke)
+        else:
+            self.consumer.subscribe(topics, on_revoke=revoke)
+
+    def poll(self, timeout: float = 1.0):
+        """Poll the consumer and track the message that was read"""
+        msg = self.consumer.poll(timeout)
+        if msg is not None and not msg.error():
+            self.track(msg)
+        self._commit_if_due()
+        return msg
+
+    def consume(self, num_messages: int = 1, timeout: float = 1.0):
+        """Consume a list of messages and track them"""
+        messages = self.consumer.consume(num_messages=num_messages, timeout=timeout)
+        for msg in messages:
+            if not msg.error():
+                self.track(msg)
+        self._commit_if_due()
+        return messages
+
+    def track(self, msg):
+        """Record that a message was read and is about to be processed"""
+        key = (msg.topic(), msg.partition())
+        with self._lock:
+            self._in_flight.setdefault(key, collections.deque()).append(msg.offset())
+            self._done.setdefault(key, set())
+
+    def done(self, msg):
+        """Mark a tracked message as processed, a commit is sent when the size or time threshold is reached"""
+        key = (msg.topic(), msg.partition())
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                logger.debug("Ignoring message of untracked partition {}".format(key))
+                return
+            done = self._done[key]
+            done.add(msg.offset())
+            while in_flight and in_flight[0] in done:
+                offset = in_flight.popleft()
+                done.discard(offset)
+                self._next[key] = offset + 1
+            self._since_commit += 1
+        self._commit_if_due()
+
+    def commit(self, asynchronous: bool = True, partitions=None):
+        """
+        Commit the highest contiguous processed offset of every partition that advanced since the last commit.
+
+        :param asynchronous: if False wait for the commit to complete and commit the offset of every partition, even
+                             when it was already sent by an asynchronous commit that may have failed
+        :param partitions: an optional list of (topic, partition) to restrict the commit to
+        :return: the list of `TopicPartition` committed
+        """
+        with self._lock:
+            offsets = [TopicPartition(topic, partition, offset)
+                       for (topic, partition), offset in self._next.items()
+                       if (not asynchronous or self._committed.get((topic, partition)) != offset) and
+                       (partitions is None or (topic, partition) in partitions)]
+            for tp in offsets:
+                self._committed[(tp.topic, tp.partition)] = tp.offset
+            self._since_commit = 0
+            self._last_commit = time.monotonic()
+        if not offsets:
+            return offsets
+        try:
+            self.consumer.commit(offsets=offsets, asynchronous=asynchronous)
+        except KafkaException as e:
+            logger.error("Unable to commit offsets {}: {}".format(offsets, e))
+            with self._lock:
+                for tp in offsets:
+                    if self._committed.get((tp.topic, tp.partition)) == tp.offset:
+                        del self._committed[(tp.topic, tp.partition)]
+        return offsets
+
+    def close(self):
+        """Commit the pending offsets synchronously and close the consumer"""
+        self.commit(asynchronous=False)
+        self.consumer.close()
+
+    def _commit_if_due(self):
+        with self._lock:
+            due = self._since_commit > 0 and (self._since_commit >= self.commit_every or
+                                              time.monotonic() - self._last_commit >= self.commit_interval)
+        if due:
+            self.commit()
+
+    def _on_revoke(self, partitions):
+        revoked = set((tp.topic, tp.partition) for tp in partitions)
+        self.commit(asynchronous=False, partitions=revoked)
+        with self._lock:
+            for key in revoked:
+                for state in (self._in_flight, self._done, self._next, self._committed):
+                    state.pop(key, None)
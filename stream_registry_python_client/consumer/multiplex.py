@@ -0,0 +1,86 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from logzero import logger
+from typing import Dict, List
+
+__all__ = ["MultiplexedConsumer"]
+
+
+class MultiplexedConsumer(object):
+    """
+    A single Kafka consumer that reads several streams. It keeps a topic to stream routing table so every message can
+    be attributed to, and dispatched for, the stream it belongs to.
+
+    :param consumer: the underlying Kafka consumer
+    :param streams: a dict with the list of topics of every stream read by the consumer
+    """
+
+    def __init__(self, consumer, streams: Dict[str, List[str]]):
+        self.consumer = consumer
+        self.streams = dict(streams)
+        self.routes = {}
+        for stream_name, topics in self.streams.items():
+            for topic in topics:
+                self.routes[topic] = stream_name
+
+    @property
+    def topics(self):
+        """The union of the topics of all the streams"""
+        return sorted(self.routes)
+
+    def subscribe(self, **kwargs):
+        """Subscribe the consumer to the topics of all the streams, keyword arguments are passed to `subscribe`"""
+        self.consumer.subscribe(self.topics, **kwargs)
+
+    def stream_for(self, msg):
+        """Returns the name of the stream a message was read from or None if its topic is unknown"""
+        return self.routes.get(msg.topic())
+
+    def poll(self, timeout: float = 1.0):
+        """Poll the underlying consumer, see `Consumer.poll`"""
+        return self.consumer.poll(timeout)
+
+    def dispatch(self, msg, handlers: Dict[str, object]):
+        """
+        Hand a message to the handler of its stream.
+
+        :param msg: a message without error read from this consumer
+        :param handlers: a dict of callables by stream name, each is invoked with the stream name and the message
+        :return: the value returned by the handler or None if the stream has no handler
+        """
+        stream_name = self.stream_for(msg)
+        handler = handlers.get(stream_name)
+        if handler is None:
+            logger.warning("No handler for stream {} (topic {}), skipping message".format(stream_name, msg.topic()))
+            return None
+        return handler(stream_name, msg)
+
+    def poll_and_dispatch(self, handlers: Dict[str, object], timeout: float = 1.0):
+        """
+        Poll one message and dispatch it to the handler of its stream.
+
+        :param handlers: a dict of callables by stream name, see :meth:`dispatch`
+        :param timeout: the maximum time to wait for a message
+        :return: the message that was polled, which may be None or carry an error that was not dispatched
+        """
+        msg = self.consumer.poll(timeout)
+        if msg is None:
+            return None
+        if msg.error():
+            logger.error("Consumer error: {}".format(msg.error()))
+            return msg
+        self.dispatch(msg, handlers)
+        return msg
+
+    def close(self):
+        self.consumer.close()
@@ -0,0 +1,212 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import importlib
+import multiprocessing
+import signal
+import threading
+import time
+
+from logzero import logger
+from typing import Dict
+
+import stream_registry_python_client.consumer.builder as builder
+
+__all__ = ["ConsumerGroupRunner", "main"]
+
+DEFAULT_POLL_TIMEOUT = 1.0
+DEFAULT_RESTART_DELAY = 1.0
+DEFAULT_REPORT_INTERVAL = 10.0
+DEFAULT_SHUTDOWN_TIMEOUT = 30.0
+PROCESSED_BATCH = 1000
+
+
+class ConsumerGroupRunner(object):
+    """
+    Runs a stream consumer in several processes so the message handler can use every core of the node. Each worker
+    process creates its own consumer with `create_managed_consumer`, all of them share the group.id derived from the
+    application name so the partitions of the stream are balanced between them. Auto commit is disabled, the offset
+    of a message is only committed once the handler returned. Workers that die are restarted, and on SIGTERM or
+    SIGINT the workers stop polling, commit and close their consumer before exiting.
+
+    :param dict registry_config: Config parameters, see `create_consumer`
+    :param stream_name: The name of the stream to consume.
+    :param handler: a picklable callable (i.e. a module level function) invoked with every message without error. An
+                    exception raised by the handler crashes the worker, which is then restarted and resumes from the
+                    last committed offsets.
+    :param workers: the number of worker processes, defaults to the number of cores
+    :param kafka_properties: any kafka consumer properties which will be merged with the default from the registry,
+                             'enable.auto.commit' is always disabled
+    :param avro_consumer: If True (default) AVRO consumers will be created
+    :param poll_timeout: the maximum time of each poll of the workers
+    :param restart_delay: the number of seconds to wait before restarting a dead worker
+    :param report_interval: the number of seconds between two throughput reports in the logs
+    """
+
+    def __init__(self, registry_config: Dict[str, str], stream_name: str, handler, workers: int = None,
+                 kafka_properties: Dict[str, str] = None, avro_consumer: bool = True,
+                 poll_timeout: float = DEFAULT_POLL_TIMEOUT, restart_delay: float = DEFAULT_RESTART_DELAY,
+                 report_interval: float = DEFAULT_REPORT_INTERVAL):
+        self.registry_config = registry_config
+        self.stream_name = stream_name
+        self.handler = handler
+        self.workers = workers or multiprocessing.cpu_count()
+        self.kafka_properties = kafka_properties
+        self.avro_consumer = avro_consumer
+        self.poll_timeout = poll_timeout
+        self.restart_delay = restart_delay
+        self.report_interval = report_interval
+        self.restarts = 0
+        self._stop = multiprocessing.Event()
+        self._processed = multiprocessing.Value('Q', 0)
+        self._processes = {}
+
+    @property
+    def processed(self):
+        """The number of messages handled by all the workers, each worker reports its count every 1000 messages,
+        every `report_interval` seconds and when it exits"""
+        return self._processed.value
+
+    def run(self, shutdown_timeout: float = DEFAULT_SHUTDOWN_TIMEOUT):
+        """
+        Start the workers and supervise them until :meth:`stop` is called or the process receives SIGTERM or SIGINT.
+
+        :param shutdown_timeout: the number of seconds the workers have to commit and close before being killed
+        :return: the number of messages handled by all the workers
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._on_signal)
+            signal.signal(signal.SIGINT, self._on_signal)
+
+        logger.info("Starting {} workers consuming stream {}".format(self.workers, self.stream_name))
+        for slot in range(self.workers):
+            self._start_worker(slot)
+
+        last_report = time.monotonic()
+        last_processed = 0
+        while not self._stop.is_set():
+            self._stop.wait(min(self.restart_delay, self.report_interval))
+            for slot, process in list(self._processes.items()):
+                if not process.is_alive() and not self._stop.is_set():
+                    logger.warning("Worker {} (pid {}) exited with code {}, restarting it".format(
+                        slot, process.pid, process.exitcode))
+                    self.restarts += 1
+                    self._start_worker(slot)
+            now = time.monotonic()
+            if now - last_report >= self.report_interval:
+                processed = self.processed
+                logger.info("Stream {}: {} messages handled, {:.1f} msg/s over the last {:.0f}s".format(
+                    self.stream_name, processed, (processed - last_processed) / (now - last_report),
+                    now - last_report))
+                last_report, last_processed = now, processed
+
+        self._shutdown(shutdown_timeout)
+        logger.info("Stream {}: {} messages handled, {} worker restarts".format(
+            self.stream_name, self.processed, self.restarts))
+        return self.processed
+
+    def stop(self):
+        """Ask the workers to stop, :meth:`run` returns once they are gone"""
+        self._stop.set()
+
+    def _on_signal(self, signum, frame):
+        logger.info("Received signal {}, stopping the workers".format(signum))
+        self.stop()
+
+    def _start_worker(self, slot: int):
+        process = multiprocessing.Process(target=_work, name='{}-worker-{}'.format(self.stream_name, slot),
+                                          args=(self.registry_config, self.stream_name, self.handler,
+                                                self.kafka_properties, self.avro_consumer, self.poll_timeout,
+                                                self.report_interval, self._stop, self._processed))
+        process.start()
+        self._processes[slot] = process
+
+    def _shutdown(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+        for process in self._processes.values():
+            if process.is_alive():
+                logger.warning("Worker pid {} did not stop in time, terminating it".format(process.pid))
+                process.terminate()
+                process.join()
+
+
+def _work(registry_config, stream_name, handler, kafka_properties, avro_consumer, poll_timeout, report_interval,
+          stop, processed):
+    """The body of a worker process"""
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    result = builder.create_managed_consumer(registry_config, stream_name, kafka_properties=kafka_properties,
+                                             avro_consumer=avro_consumer)
+    if result is None:
+        raise RuntimeError("Unable to create the consumer of stream {}".format(stream_name))
+    consumer, _, manager = result
+    # the shared counter is updated in batches, taking its lock for every message would serialize the workers
+    handled = 0
+    last_count = time.monotonic()
+    try:
+        while not stop.is_set():
+            msg = manager.poll(poll_timeout)
+            if msg is not None and msg.error():
+                logger.error("Consumer error: {}".format(msg.error()))
+            elif msg is not None:
+                handler(msg)
+                manager.done(msg)
+                handled += 1
+            if handled and (handled >= PROCESSED_BATCH or time.monotonic() - last_count >= report_interval):
+                _count(processed, handled)
+                handled = 0
+                last_count = time.monotonic()
+    except BaseException:
+        # the message that failed is not committed, the restarted worker reads it again
+        consumer.close()
+        raise
+    finally:
+        _count(processed, handled)
+    manager.close()
+
+
+def _count(processed, handled: int):
+    if handled:
+        with processed.get_lock():
+            processed.value += handled
+
+
+def main(args=None):
+    """
+    Command line entry point:
+
+        python -m stream_registry_python_client.consumer.runner --base-url http://streamregistry.org \\
+            --region us-east-1 --app-name myapp --stream MyStream --handler mypackage.handlers:handle --workers 8
+    """
+    parser = argparse.ArgumentParser(description="Consume a stream with a group of worker processes")
+    parser.add_argument('--base-url', required=True, help="The base URL to the stream registry")
+    parser.add_argument('--region', required=True, help="The region where the application is running")
+    parser.add_argument('--app-name', required=True, help="The name of the consuming application")
+    parser.add_argument('--stream', required=True, help="The name of the stream to consume")
+    parser.add_argument('--handler', required=True, help="The message handler as module:function")
+    parser.add_argument('--workers', type=int, default=None, help="The number of worker processes")
+    parser.add_argument('--no-avro', action='store_true', help="Create plain consumers instead of AVRO ones")
+    options = parser.parse_args(args)
+
+    module_name, _, function_name = options.handler.partition(':')
+    handler = getattr(importlib.import_module(module_name), function_name)
+    registry_config = {'base_url': options.base_url, 'region': options.region, 'app_name': options.app_name}
+    ConsumerGroupRunner(registry_config, options.stream, handler, workers=options.workers,
+                        avro_consumer=not options.no_avro).run()
+
+
+if __name__ == '__main__':
+    main()
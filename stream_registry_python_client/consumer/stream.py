@@ -0,0 +1,95 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import time
+
+from logzero import logger
+
+__all__ = ["Batch", "consume_batches"]
+
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_MAX_WAIT = 1.0
+
+
+class Batch(object):
+    """
+    A batch of messages read from a consumer.
+
+    :param messages: the messages without error, in the order they were consumed
+    :param errors: the messages that carry an error (including partition EOF events)
+    :param decoded: the decoded values of `messages`, in the same order, when a decoder was given
+    """
+
+    def __init__(self, messages, errors, decoded=None):
+        self.messages = messages
+        self.errors = errors
+        self.decoded = decoded
+
+    def by_partition(self):
+        """
+        Group the messages by partition, within a partition the messages keep their offset order.
+
+        :return: an ordered dict of lists of messages keyed by (topic, partition)
+        """
+        partitions = collections.OrderedDict()
+        for msg in self.messages:
+            partitions.setdefault((msg.topic(), msg.partition()), []).append(msg)
+        return partitions
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+
+def consume_batches(consumer, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT,
+                    decode=None):
+    """
+    Turn a consumer into a generator of batches. Messages are fetched with `consumer.consume` so a whole batch costs a
+    handful of calls into librdkafka instead of one `poll` per message. A batch is yielded as soon as it holds
+    `max_batch_size` messages or `max_wait` seconds went by since it was started, whichever happens first. Empty
+    batches are not yielded, stop consuming by closing the generator (i.e. breaking out of the loop).
+
+    :param consumer: a subscribed consumer, as returned by `create_consumer`
+    :param max_batch_size: the maximum number of messages (errors included) in a batch
+    :param max_wait: the maximum number of seconds to spend filling a batch
+    :param decode: an optional callable that receives the list of messages of a batch and returns the list of their
+                   decoded values, its result is available as `Batch.decoded`
+    :return: a generator of :class:`Batch`
+    """
+    if max_batch_size < 1:
+        raise ValueError("The batch size must be at least 1")
+
+    while True:
+        messages = []
+        errors = []
+        deadline = time.monotonic() + max_wait
+        while len(messages) + len(errors) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for msg in consumer.consume(num_messages=max_batch_size - len(messages) - len(errors), timeout=remaining):
+                if msg.error():
+                    errors.append(msg)
+                else:
+                    messages.append(msg)
+
+        if not messages and not errors:
+            continue
+        if errors:
+            logger.debug("{} consumer errors in batch of {} messages".format(len(errors), len(messages)))
+        decoded = None
+        if decode is not None:
+            decoded = decode(messages) if messages else []
+        yield Batch(messages, errors, decoded)
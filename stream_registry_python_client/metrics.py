@@ -0,0 +1,261 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from logzero import logger
+from typing import Dict
+
+__all__ = ["Instrumentation", "InMemoryInstrumentation", "PrometheusExporter", "set_instrumentation",
+           "get_instrumentation", "timer", "increment", "gauge", "apply_statistics", "record_statistics"]
+
+
+class Instrumentation(object):
+    """
+    The instrumentation hooks of the library. This base class does nothing, subclass it to forward the measures to a
+    metrics system and install it with :func:`set_instrumentation`. Names are dotted, tags are keyword arguments.
+    """
+
+    def timing(self, name: str, seconds: float, **tags):
+        """Record the duration of an operation"""
+        pass
+
+    def increment(self, name: str, value: float = 1, **tags):
+        """Increment a counter"""
+        pass
+
+    def gauge(self, name: str, value: float, **tags):
+        """Set the current value of a gauge"""
+        pass
+
+
+class InMemoryInstrumentation(Instrumentation):
+    """Keeps every measure in memory so it can be inspected or exported with :class:`PrometheusExporter`"""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def timing(self, name: str, seconds: float, **tags):
+        key = (name, _tags_key(tags))
+        with self._lock:
+            count, total, maximum = self.timings.get(key, (0, 0.0, 0.0))
+            self.timings[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+    def increment(self, name: str, value: float = 1, **tags):
+        key = (name, _tags_key(tags))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, **tags):
+        with self._lock:
+            self.gauges[(name, _tags_key(tags))] = value
+
+    def counter(self, name: str, **tags):
+        """Returns the value of a counter, 0 if it was never incremented"""
+        with self._lock:
+            return self.counters.get((name, _tags_key(tags)), 0)
+
+    def snapshot(self):
+        """Returns consistent copies of the counters, gauges and timings"""
+        with self._lock:
+            return dict(self.counters), dict(self.gauges), dict(self.timings)
+
+
+class PrometheusExporter(object):
+    """
+    Renders the measures of an :class:`InMemoryInstrumentation` in the Prometheus text exposition format, and
+    optionally serves them over HTTP.
+
+    :param instrumentation: the instrumentation to export
+    :param prefix: the prefix of every metric name
+    """
+
+    def __init__(self, instrumentation: InMemoryInstrumentation, prefix: str = 'stream_registry'):
+        self.instrumentation = instrumentation
+        self.prefix = prefix
+        self._server = None
+
+    def render(self):
+        """Returns the text exposition of all the measures"""
+        counters, gauges, timings = self.instrumentation.snapshot()
+        lines = []
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            for name, series in _by_name(values):
+                metric = self._metric_name(name) + ('_total' if kind == 'counter' else '')
+                lines.append('# TYPE {} {}'.format(metric, kind))
+                for tags, value in series:
+                    lines.append('{}{} {}'.format(metric, _labels(tags), _number(value)))
+        for name, series in _by_name(timings):
+            metric = self._metric_name(name) + '_seconds'
+            lines.append('# TYPE {} summary'.format(metric))
+            for tags, (count, total, maximum) in series:
+                lines.append('{}_count{} {}'.format(metric, _labels(tags), count))
+                lines.append('{}_sum{} {}'.format(metric, _labels(tags), _number(total)))
+            lines.append('# TYPE {}_max gauge'.format(metric))
+            for tags, (count, total, maximum) in series:
+                lines.append('{}_max{} {}'.format(metric, _labels(tags), _number(maximum)))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, address: str = ''):
+        """
+        Serve the measures on http://address:port/metrics from a background thread.
+
+        :return: the HTTP server, call `shutdown` on it to stop serving
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = HTTPServer((address, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='prometheus-exporter', daemon=True).start()
+        return self._server
+
+    def _metric_name(self, name: str):
+        return re.sub(r'[^a-zA-Z0-9_]', '_', '{}_{}'.format(self.prefix, name))
+
+
+__instrumentation = Instrumentation()
+
+
+def set_instrumentation(instrumentation: Instrumentation):
+    """Install the instrumentation used by the whole library, None restores the no-op default"""
+    global __instrumentation
+    __instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+
+
+def get_instrumentation():
+    """Returns the instrumentation used by the library"""
+    return __instrumentation
+
+
+@contextlib.contextmanager
+def timer(name: str, **tags):
+    """
+    Time the enclosed block. The duration is recorded with an `outcome` tag set to 'success' or 'error', errors also
+    increment the `<name>.errors` counter.
+    """
+    instrumentation = get_instrumentation()
+    start = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        instrumentation.timing(name, time.monotonic() - start, outcome='error', **tags)
+        instrumentation.increment(name + '.errors', **tags)
+        raise
+    instrumentation.timing(name, time.monotonic() - start, outcome='success', **tags)
+
+
+def increment(name: str, value: float = 1, **tags):
+    """Increment a counter of the installed instrumentation"""
+    get_instrumentation().increment(name, value, **tags)
+
+
+def gauge(name: str, value: float, **tags):
+    """Set a gauge of the installed instrumentation"""
+    get_instrumentation().gauge(name, value, **tags)
+
+
+def apply_statistics(properties: Dict[str, str], registry_config: Dict[str, str]):
+    """
+    Enable librdkafka statistics on Kafka properties when the registry configuration has a `statistics_interval_ms`.
+    The statistics are parsed by :func:`record_statistics` into gauges of the installed instrumentation.
+
+    :param properties: the Kafka properties, modified in place
+    :param dict registry_config: the registry configuration
+    :return: the properties
+    """
+    interval = registry_config.get('statistics_interval_ms')
+    if interval and 'statistics.interval.ms' not in properties:
+        properties['statistics.interval.ms'] = int(interval)
+        properties.setdefault('stats_cb', record_statistics)
+    return properties
+
+
+def record_statistics(stats_json: str):
+    """
+    Turn a librdkafka statistics document into gauges: the client queue depth, per broker round trip time and
+    request queues, and per partition queue depth and consumer lag.
+    """
+    try:
+        stats = json.loads(stats_json)
+    except ValueError as e:
+        logger.warning("Unable to parse librdkafka statistics: {}".format(e))
+        return
+    instrumentation = get_instrumentation()
+    client_name = stats.get('name', '')
+    instrumentation.gauge('kafka.queue.messages', stats.get('msg_cnt', 0), client=client_name)
+    instrumentation.gauge('kafka.queue.bytes', stats.get('msg_size', 0), client=client_name)
+    instrumentation.gauge('kafka.replyq', stats.get('replyq', 0), client=client_name)
+
+    for broker_name, broker in (stats.get('brokers') or {}).items():
+        if broker.get('nodeid', 0) < 0:
+            continue
+        rtt = broker.get('rtt') or {}
+        if rtt.get('cnt'):
+            instrumentation.gauge('kafka.broker.rtt_avg_seconds', rtt.get('avg', 0) / 1e6, client=client_name,
+                                  broker=broker_name)
+            instrumentation.gauge('kafka.broker.rtt_p99_seconds', rtt.get('p99', 0) / 1e6, client=client_name,
+                                  broker=broker_name)
+        instrumentation.gauge('kafka.broker.outbuf', broker.get('outbuf_cnt', 0), client=client_name,
+                              broker=broker_name)
+        instrumentation.gauge('kafka.broker.waitresp', broker.get('waitresp_cnt', 0), client=client_name,
+                              broker=broker_name)
+
+    for topic_name, topic in (stats.get('topics') or {}).items():
+        for partition_id, partition in (topic.get('partitions') or {}).items():
+            if int(partition_id) < 0:
+                continue
+            tags = {'client': client_name, 'topic': topic_name, 'partition': partition_id}
+            instrumentation.gauge('kafka.partition.msgq', partition.get('msgq_cnt', 0), **tags)
+            instrumentation.gauge('kafka.partition.xmit_msgq', partition.get('xmit_msgq_cnt', 0), **tags)
+            lag = partition.get('consumer_lag', -1)
+            if lag is not None and lag >= 0:
+                instrumentation.gauge('kafka.partition.consumer_lag', lag, **tags)
+
+
+def _tags_key(tags):
+    return tuple(sorted((k, str(v)) for k, v in tags.items()))
+
+
+def _by_name(values):
+    names = {}
+    for (name, tags), value in sorted(values.items()):
+        names.setdefault(name, []).append((tags, value))
+    return sorted(names.items())
+
+
+def _labels(tags):
+    if not tags:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"')) for k, v in tags) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
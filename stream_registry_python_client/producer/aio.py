@@ -0,0 +1,99 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+
+from logzero import logger
+from confluent_kafka import KafkaException
+
+__all__ = ["AsyncProducer"]
+
+DEFAULT_POLL_INTERVAL = 0.1
+
+
+class AsyncProducer(object):
+    """
+    An asyncio facade over a Kafka producer. A single poller thread serves the delivery reports of every in flight
+    message and hands them over to the event loop, so `await producer.produce(...)` resolves once the message is
+    delivered without blocking the loop or costing a thread per message.
+
+    :param producer: the underlying `confluent_kafka.Producer`
+    :param loop: the event loop the deliveries are resolved on, defaults to the current event loop
+    :param poll_interval: the maximum time of each poll of the poller thread
+    """
+
+    def __init__(self, producer, loop=None, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.producer = producer
+        self.loop = loop or asyncio.get_event_loop()
+        self.poll_interval = poll_interval
+        self._closed = threading.Event()
+        self._poller = threading.Thread(target=self._poll_loop, name='async-producer-poller', daemon=True)
+        self._poller.start()
+
+    def produce_nowait(self, topic: str, value=None, key=None, **kwargs):
+        """
+        Enqueue a message without waiting for its delivery.
+
+        :return: a future resolved with the delivered message, or failed with a `KafkaException`
+        :raises BufferError: if the local queue is full
+        """
+        future = self.loop.create_future()
+
+        def on_delivery(err, msg):
+            self.loop.call_soon_threadsafe(_resolve, future, err, msg)
+
+        self.producer.produce(topic, value=value, key=key, on_delivery=on_delivery, **kwargs)
+        return future
+
+    async def produce(self, topic: str, value=None, key=None, **kwargs):
+        """
+        Produce a message and wait for its delivery report. When the local queue is full it waits for room without
+        blocking the event loop.
+
+        :return: the delivered message
+        :raises KafkaException: if the message could not be delivered
+        """
+        while True:
+            try:
+                future = self.produce_nowait(topic, value=value, key=key, **kwargs)
+                break
+            except BufferError:
+                await asyncio.sleep(self.poll_interval)
+        return await future
+
+    async def flush(self, timeout: float = 30.0):
+        """Wait for all the queued messages to be delivered, returns the number of messages still queued"""
+        return await self.loop.run_in_executor(None, self.producer.flush, timeout)
+
+    async def close(self, timeout: float = 30.0):
+        """Flush the queue and stop the poller thread"""
+        remaining = await self.flush(timeout)
+        self._closed.set()
+        await self.loop.run_in_executor(None, self._poller.join)
+        return remaining
+
+    def _poll_loop(self):
+        while not self._closed.is_set():
+            try:
+                self.producer.poll(self.poll_interval)
+            except Exception as e:
+                logger.error("Producer poll failed: {}".format(e))
+
+
+def _resolve(future, err, msg):
+    if future.done():
+        return
+    if err is not None:
+        future.set_exception(KafkaException(err))
+    else:
+        future.set_result(msg)
@@ -0,0 +1,188 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import io
+import json
+import struct
+import threading
+
+from logzero import logger
+from confluent_kafka import avro
+
+import avro.io as avro_io
+
+try:
+    from fastavro import parse_schema, schemaless_writer
+    HAS_FAST = True
+except ImportError:
+    HAS_FAST = False
+
+__all__ = ["load_schema", "AvroBatchEncoder", "AvroBatchProducer"]
+
+MAGIC_BYTE = 0
+
+# process wide caches keyed by the hash of the schema text
+_schemas = {}
+_writers = {}
+_schema_ids = {}
+_cache_lock = threading.Lock()
+
+
+def load_schema(schema_str: str):
+    """
+    Parse an AVRO schema (AVSC) string. Schemas are parsed once per process and shared by every producer.
+
+    :param schema_str: the schema text
+    :return: the parsed schema
+    """
+    digest = _digest(schema_str)
+    schema = _schemas.get(digest)
+    if schema is None:
+        schema = avro.loads(schema_str)
+        with _cache_lock:
+            _schemas[digest] = schema
+    return schema
+
+
+class AvroBatchEncoder(object):
+    """
+    Encodes records into schema registry framed AVRO payloads. The schemas are registered once per process and
+    subject, and each schema is compiled once into a writer (with `fastavro` when it is installed) that is reused for
+    every record.
+
+    :param schema_registry: a schema registry client with a `register(subject, schema)` method, usually a
+                            `confluent_kafka.avro.CachedSchemaRegistryClient`
+    :param key_schema_str: the AVSC of the message keys, None if the keys are not encoded
+    :param value_schema_str: the AVSC of the message values
+    """
+
+    def __init__(self, schema_registry, key_schema_str: str, value_schema_str: str):
+        self.schema_registry = schema_registry
+        self.key_schema_str = key_schema_str
+        self.value_schema_str = value_schema_str
+
+    def encode(self, topic: str, key=None, value=None):
+        """Encode one record, returns the (key, value) payloads, a None key or value is left as None"""
+        return self.encode_batch(topic, [(key, value)])[0]
+
+    def encode_batch(self, topic: str, records):
+        """
+        Encode many records written to the same topic.
+
+        :param topic: the topic the records are written to, it names the schema registry subjects
+        :param records: an iterable of (key, value) tuples
+        :return: a list of (key, value) payloads in the same order
+        """
+        value_header, value_writer = self._framing(topic + '-value', self.value_schema_str)
+        key_header = key_writer = None
+        if self.key_schema_str is not None:
+            key_header, key_writer = self._framing(topic + '-key', self.key_schema_str)
+
+        encoded = []
+        for key, value in records:
+            if key is not None and key_writer is not None:
+                key = _write(key_header, key_writer, key)
+            if value is not None:
+                value = _write(value_header, value_writer, value)
+            encoded.append((key, value))
+        return encoded
+
+    def _framing(self, subject: str, schema_str: str):
+        digest = _digest(schema_str)
+        registry_key = (getattr(self.schema_registry, 'url', id(self.schema_registry)), subject, digest)
+        schema_id = _schema_ids.get(registry_key)
+        if schema_id is None:
+            schema_id = self.schema_registry.register(subject, load_schema(schema_str))
+            if schema_id is None or schema_id < 0:
+                raise ValueError("Unable to register the schema of subject {}".format(subject))
+            with _cache_lock:
+                _schema_ids[registry_key] = schema_id
+        writer = _writers.get(digest)
+        if writer is None:
+            writer = _compile_writer(schema_str)
+            with _cache_lock:
+                _writers[digest] = writer
+        return struct.pack('>bI', MAGIC_BYTE, schema_id), writer
+
+
+class AvroBatchProducer(object):
+    """
+    A producer that encodes AVRO records with an :class:`AvroBatchEncoder` before handing the bytes to a plain Kafka
+    producer.
+
+    :param producer: the underlying `confluent_kafka.Producer`
+    :param encoder: the :class:`AvroBatchEncoder` of the stream
+    """
+
+    def __init__(self, producer, encoder: AvroBatchEncoder):
+        self.producer = producer
+        self.encoder = encoder
+
+    def produce(self, topic: str, value=None, key=None, **kwargs):
+        """Encode and produce one record, keyword arguments are passed to `Producer.produce`"""
+        key, value = self.encoder.encode(topic, key, value)
+        self.producer.produce(topic, value=value, key=key, **kwargs)
+
+    def produce_batch(self, topic: str, records, poll_timeout: float = 1.0, **kwargs):
+        """
+        Encode many records in one pass and produce them. When the local queue is full the producer is polled until
+        there is room again.
+
+        :param topic: the topic to produce to
+        :param records: an iterable of (key, value) tuples
+        :param poll_timeout: the maximum time of each wait for room in the queue
+        :param kwargs: passed to every `Producer.produce` call, i.e. `on_delivery`
+        :return: the number of records produced
+        """
+        encoded = self.encoder.encode_batch(topic, records)
+        for key, value in encoded:
+            while True:
+                try:
+                    self.producer.produce(topic, value=value, key=key, **kwargs)
+                    break
+                except BufferError:
+                    logger.debug("Producer queue is full, waiting for deliveries")
+                    self.producer.poll(poll_timeout)
+            self.producer.poll(0)
+        return len(encoded)
+
+    def poll(self, timeout: float = 0):
+        return self.producer.poll(timeout)
+
+    def flush(self, timeout: float = None):
+        if timeout is None:
+            return self.producer.flush()
+        return self.producer.flush(timeout)
+
+
+def _digest(schema_str: str):
+    return hashlib.sha256(schema_str.encode('utf-8')).hexdigest()
+
+
+def _write(header: bytes, writer, record):
+    out = io.BytesIO()
+    out.write(header)
+    writer(out, record)
+    return out.getvalue()
+
+
+def _compile_writer(schema_str: str):
+    if HAS_FAST:
+        try:
+            fast_schema = parse_schema(json.loads(schema_str))
+            return lambda out, record: schemaless_writer(out, fast_schema, record)
+        except Exception as e:
+            logger.warning("fastavro could not compile the schema, falling back to avro: {}".format(e))
+
+    datum_writer = avro_io.DatumWriter(load_schema(schema_str))
+    return lambda out, record: datum_writer.write(record, avro_io.BinaryEncoder(out))
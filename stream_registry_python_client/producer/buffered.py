@@ -0,0 +1,224 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import threading
+import time
+
+from logzero import logger
+from typing import Dict
+from confluent_kafka import Producer
+
+__all__ = ["PROFILES", "apply_profile", "DeliveryStats", "BufferedProducer"]
+
+DEFAULT_PRODUCE_TIMEOUT = 30.0
+DEFAULT_POLL_INTERVAL = 0.1
+DEFAULT_STATISTICS_INTERVAL_MS = 1000
+
+PROFILES = {
+    'throughput': {
+        'linger.ms': 50,
+        'batch.num.messages': 10000,
+        'compression.type': 'lz4',
+        'queue.buffering.max.messages': 500000,
+    },
+    'balanced': {
+        'linger.ms': 10,
+        'compression.type': 'lz4',
+    },
+    'latency': {
+        'linger.ms': 0,
+        'compression.type': 'none',
+    },
+}
+
+
+def apply_profile(properties: Dict[str, str], profile: str):
+    """
+    Add the defaults of a throughput profile to Kafka properties. Properties that are already set, either by the
+    stream registry or by the user, are left untouched.
+
+    :param properties: the merged Kafka properties
+    :param profile: the name of a profile in `PROFILES`, None to leave the properties as they are
+    :return: a new dict with the profile defaults applied
+    """
+    if profile is None:
+        return dict(properties)
+    if profile not in PROFILES:
+        raise ValueError("Unknown producer profile {}, expected one of {}".format(profile, sorted(PROFILES)))
+    merged = dict(PROFILES[profile])
+    merged.update(properties)
+    return merged
+
+
+class DeliveryStats(object):
+    """
+    Delivery counters of a producer. Failures are counted from the delivery reports, which librdkafka only sends for
+    failed messages. The transmitted messages and bytes are the `txmsgs` and `txmsg_bytes` totals of the librdkafka
+    statistics, refreshed every statistics interval. They count the messages sent to the brokers, not the ones the
+    brokers acknowledged: a message that fails after it was sent is both transmitted and failed, and a retried message
+    is transmitted once per attempt.
+    """
+
+    def __init__(self):
+        self.transmitted = 0
+        self.failed = 0
+        self.transmitted_bytes = 0
+        self.last_error = None
+        self.reports = 0
+        self._lock = threading.Lock()
+
+    def record(self, err, msg):
+        """Delivery report callback, successful deliveries are ignored since they are counted from the statistics"""
+        if err is None:
+            return
+        with self._lock:
+            self.failed += 1
+            self.last_error = err
+
+    def record_statistics(self, stats_json: str):
+        """Statistics callback, takes the transmitted totals from a librdkafka statistics document"""
+        try:
+            stats = json.loads(stats_json)
+        except ValueError as e:
+            logger.warning("Unable to parse librdkafka statistics: {}".format(e))
+            return
+        with self._lock:
+            self.transmitted = stats.get('txmsgs', self.transmitted)
+            self.transmitted_bytes = stats.get('txmsg_bytes', self.transmitted_bytes)
+            self.reports += 1
+
+    def snapshot(self):
+        """Returns a dict with a consistent copy of the counters"""
+        with self._lock:
+            return {'transmitted': self.transmitted, 'failed': self.failed, 'transmitted_bytes': self.transmitted_bytes,
+                    'last_error': self.last_error}
+
+
+class BufferedProducer(object):
+    """
+    A producer that handles backpressure. A background thread keeps polling the producer so delivery reports are
+    served and the local queue drains, and `produce` waits for room in the queue instead of raising `BufferError`.
+    librdkafka only reports failed deliveries (`delivery.report.only.error`) and the transmitted totals are read from
+    its statistics into :class:`DeliveryStats`, so nothing calls back into Python for each delivered message.
+
+    :param properties: the Kafka properties of the producer. An `on_delivery` callback is kept and still receives
+                       every report, a `stats_cb` receives the statistics as well.
+    :param poll_interval: the maximum time of each poll of the background thread
+    :param producer_factory: the callable that creates the producer out of the properties
+    """
+
+    def __init__(self, properties: Dict[str, str], poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 producer_factory=Producer):
+        self.stats = DeliveryStats()
+        properties = dict(properties)
+        user_on_delivery = properties.pop('on_delivery', None)
+        if user_on_delivery is None:
+            properties.setdefault('delivery.report.only.error', True)
+            properties['on_delivery'] = self.stats.record
+        else:
+            properties['on_delivery'] = _chain(self.stats.record, user_on_delivery)
+        user_stats_cb = properties.pop('stats_cb', None)
+        properties['stats_cb'] = _chain(self.stats.record_statistics, user_stats_cb)
+        properties.setdefault('statistics.interval.ms', DEFAULT_STATISTICS_INTERVAL_MS)
+        self.statistics_interval = float(properties['statistics.interval.ms']) / 1000.0
+        self.producer = producer_factory(properties)
+        self.poll_interval = poll_interval
+        self._room = threading.Condition()
+        self._closed = threading.Event()
+        self._poller = threading.Thread(target=self._poll_loop, name='buffered-producer-poller', daemon=True)
+        self._poller.start()
+
+    def produce(self, topic: str, value=None, key=None, timeout: float = DEFAULT_PRODUCE_TIMEOUT, **kwargs):
+        """
+        Produce a message, waiting for room in the local queue when it is full.
+
+        :param topic: the topic to produce to
+        :param value: the message value
+        :param key: the message key
+        :param timeout: the maximum number of seconds to wait for room in the queue, None waits forever
+        :param kwargs: any other argument accepted by `Producer.produce`
+        :raises BufferError: if the queue is still full when the timeout expires
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self.producer.produce(topic, value=value, key=key, **kwargs)
+                return
+            except BufferError:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise
+                with self._room:
+                    self._room.wait(self.poll_interval if remaining is None else min(remaining, self.poll_interval))
+
+    async def produce_async(self, topic: str, value=None, key=None, timeout: float = DEFAULT_PRODUCE_TIMEOUT,
+                            **kwargs):
+        """Coroutine version of :meth:`produce`, waiting for room in the queue does not block the event loop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self.producer.produce(topic, value=value, key=key, **kwargs)
+                return
+            except BufferError:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise
+                await asyncio.sleep(self.poll_interval if remaining is None else min(remaining, self.poll_interval))
+
+    def flush(self, timeout: float = DEFAULT_PRODUCE_TIMEOUT):
+        """Wait for all the queued messages to be delivered, returns the number of messages still queued"""
+        return self.producer.flush(timeout)
+
+    def close(self, timeout: float = DEFAULT_PRODUCE_TIMEOUT):
+        """Stop the background poller and flush the queue, returns the number of messages that were not delivered"""
+        self._closed.set()
+        self._poller.join()
+        remaining = self.producer.flush(timeout)
+        if remaining:
+            logger.warning("{} messages were not delivered before closing the producer".format(remaining))
+        self._await_statistics()
+        return remaining
+
+    def __len__(self):
+        return len(self.producer)
+
+    def _poll_loop(self):
+        while not self._closed.is_set():
+            try:
+                served = self.producer.poll(self.poll_interval)
+            except Exception as e:
+                logger.error("Producer poll failed: {}".format(e))
+                served = 0
+            if served:
+                with self._room:
+                    self._room.notify_all()
+
+    def _await_statistics(self):
+        """Serve one more statistics report so the counters include the messages sent by the last flush"""
+        if self.statistics_interval <= 0:
+            return
+        reports = self.stats.reports
+        deadline = time.monotonic() + 2 * self.statistics_interval
+        while self.stats.reports == reports and time.monotonic() < deadline:
+            self.producer.poll(min(self.poll_interval, self.statistics_interval))
+
+
+def _chain(first, second):
+    if second is None:
+        return first
+
+    def both(*args):
+        first(*args)
+        second(*args)
+    return both
@@ -10,18 +10,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+
 from logzero import logger
 from typing import Dict
 from confluent_kafka import Producer
-from confluent_kafka import avro
-from confluent_kafka.avro import AvroProducer
+from confluent_kafka.avro import AvroProducer, CachedSchemaRegistryClient
 
 import stream_registry_python_client.restclient as client
+from stream_registry_python_client import metrics
+from stream_registry_python_client.producer.aio import AsyncProducer
+from stream_registry_python_client.producer.avro_encoder import load_schema, AvroBatchEncoder, AvroBatchProducer
+from stream_registry_python_client.producer.buffered import apply_profile, BufferedProducer
+from stream_registry_python_client.producer.pool import default_pool
+from stream_registry_python_client.region import select_region_config
 
-__all__ = ['create_producer']
+__all__ = ['create_producer', 'create_producer_async', 'create_producers', 'create_buffered_producer', 'create_avro_producer',
+           'create_avro_batch_producer', 'release_producer']
 
 
-def create_producer(registry_config: Dict[str, str], stream_name: str, kafka_properties=None):
+def create_producer(registry_config: Dict[str, str], stream_name: str, kafka_properties=None, shared: bool = False):
     """
     Call this method to create a Kafka High Level producer. This method will subscribe the producer with the stream
     registry and initialize the producer object with the properties coming from the registry.
@@ -34,28 +42,127 @@ def create_producer(registry_config: Dict[str, str], stream_name: str, kafka_pro
     :param stream_name: The name of the stream to produce to.
     :param kafka_properties: any kafka producer properties which will be merged with the default from the stream
                              registry. These need to be valid Kafka configuration properties.
+    :param shared: if True the producer is taken from the process wide producer pool, streams that resolve to the
+                   same Kafka properties share one producer. Shared producers must be given back with
+                   :func:`release_producer` instead of being flushed and discarded.
     :return: a tuple with the producer object and the topic for the stream
     """
-    registration = client.register_producer(registry_config, stream_name)
-    if registration is None:
-        logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
-        return None, None
+    with metrics.timer('builder.create_producer', stream=stream_name):
+        registration = client.register_producer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None, None
+        return __producer_from_registration(registry_config, registration, kafka_properties, shared)
+
+
+async def create_producer_async(registry_config: Dict[str, str], stream_name: str, kafka_properties=None, loop=None):
+    """
+    The asyncio version of :func:`create_producer`. The registration does not block the event loop and the producer
+    is wrapped in an :class:`AsyncProducer` whose `produce` coroutine resolves when the message is delivered.
+
+    :param dict registry_config: Config parameters, see :func:`create_producer`
+    :param stream_name: The name of the stream to produce to.
+    :param kafka_properties: any kafka producer properties which will be merged with the default from the stream
+                             registry. These need to be valid Kafka configuration properties.
+    :param loop: the event loop to use, defaults to the current event loop
+    :return: a tuple with the :class:`AsyncProducer` and the topic for the stream
+    """
+    with metrics.timer('builder.create_producer_async', stream=stream_name):
+        loop = loop or asyncio.get_event_loop()
+        registration = await loop.run_in_executor(None, client.register_producer, registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None, None
+        p, topic = __producer_from_registration(registry_config, registration, kafka_properties, False)
+        return AsyncProducer(p, loop), topic
+
+
+def create_producers(registry_config: Dict[str, str], stream_names, kafka_properties=None, max_workers: int = None,
+                     shared: bool = False):
+    """
+    Call this method to create one Kafka High Level producer per stream. The registrations to the stream registry are
+    issued concurrently so the time to start many producers is bound by the slowest registration.
+
+    :param dict registry_config: Config parameters, see :func:`create_producer`
+    :param stream_names: the names of the streams to produce to.
+    :param kafka_properties: any kafka producer properties which will be merged with the default from the stream
+                             registry, these are applied to every producer.
+    :param max_workers: the maximum number of concurrent registrations
+    :param shared: if True the producers are taken from the process wide producer pool, see :func:`create_producer`
+    :return: a tuple of two dicts, the first maps each stream name to its (producer, topic) tuple and the second maps
+             the stream names that could not be created to the error that caused it.
+    """
+    with metrics.timer('builder.create_producers'):
+        registrations, errors = client.register_many(registry_config, stream_names, client.PRODUCER_ROLE, max_workers)
+        producers = {}
+        for stream_name, registration in registrations.items():
+            try:
+                producers[stream_name] = __producer_from_registration(registry_config, registration, kafka_properties,
+                                                                      shared)
+            except Exception as e:
+                logger.error("Unable to create Kafka Producer for stream {}: {}".format(stream_name, e))
+                errors[stream_name] = e
+        return producers, errors
+
+
+def __producer_from_registration(registry_config: Dict[str, str], registration, kafka_properties, shared: bool):
+    """ Build the high level producer described by a stream registry registration"""
 
     """Traverse the JSON object to get to the actual kafka configuration"""
-    config_elements = registration['regionStreamConfigList'][0]['streamConfiguration']
+    region_config = select_region_config(registration, registry_config)
+    config_elements = region_config['streamConfiguration']
     """ Merge stream registry configuration into kafka properties"""
-    properties = __merge_properties(config_elements, kafka_properties)
+    properties = metrics.apply_statistics(__merge_properties(config_elements, kafka_properties), registry_config)
 
     """ For whatever reason a unknow property is not ignored so for now remove registry since it is not needed"""
     properties.pop('schema.registry.url')
 
-    p = Producer(properties)
-    topic = registration['regionStreamConfigList'][0]['topics'][0]
+    with metrics.timer('builder.build_producer', shared=shared):
+        if shared:
+            p = default_pool.acquire(properties)
+        else:
+            p = Producer(properties)
+    topic = region_config['topics'][0]
     return p, topic
 
 
+def create_buffered_producer(registry_config: Dict[str, str], stream_name: str, kafka_properties=None,
+                             profile: str = 'throughput', poll_interval: float = 0.1):
+    """
+    Call this method to create a high throughput producer that handles backpressure. The returned
+    :class:`BufferedProducer` polls the producer from a background thread, waits for room in the queue instead of
+    raising `BufferError` and aggregates the failed delivery reports and the transmitted totals of the librdkafka
+    statistics in `producer.stats`.
+
+    :param dict registry_config: Config parameters, see :func:`create_producer`
+    :param stream_name: The name of the stream to produce to.
+    :param kafka_properties: any kafka producer properties which will be merged with the default from the stream
+                             registry. These need to be valid Kafka configuration properties.
+    :param profile: the name of the `producer.buffered.PROFILES` entry whose linger, batching and compression
+                    defaults are added to the properties that the registry and the user did not set, None for none
+    :param poll_interval: the maximum time of each poll of the background thread
+    :return: a tuple with the :class:`BufferedProducer` and the topic for the stream
+    """
+    with metrics.timer('builder.create_buffered_producer', stream=stream_name):
+        registration = client.register_producer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None, None
+
+        """Traverse the JSON object to get to the actual kafka configuration"""
+        region_config = select_region_config(registration, registry_config)
+        config_elements = region_config['streamConfiguration']
+        properties = apply_profile(__merge_properties(config_elements, kafka_properties), profile)
+        metrics.apply_statistics(properties, registry_config)
+        properties.pop('schema.registry.url', None)
+
+        p = BufferedProducer(properties, poll_interval)
+        topic = region_config['topics'][0]
+        return p, topic
+
+
 def create_avro_producer(registry_config: Dict[str, str], stream_name: str, key_schema_str: str, value_schema_str: str,
-                         kafka_properties: Dict[str, str] = None):
+                         kafka_properties: Dict[str, str] = None, shared: bool = False):
     """
     Call this method to create a Kafka AVRO ready producer. This method will subscribe the producer with the stream
     registry and initialize the producer object with the properties coming from the registry.
@@ -72,31 +179,102 @@ def create_avro_producer(registry_config: Dict[str, str], stream_name: str, key_
                             needs a schema to parse the encoded objects this CANNOT be None and MUST be provided.
     :param kafka_properties: any kafka producer properties which will be merged with the default from the stream
                              registry. These need to be valid Kafka configuration properties.
+    :param shared: if True the producer is taken from the process wide producer pool, streams that resolve to the
+                   same Kafka properties and schemas share one producer. Shared producers must be given back with
+                   :func:`release_producer`.
     :return: a tuple with the producer object and the topic for the stream
     """
-    if value_schema_str is None or key_schema_str is None:
-        logger.error("An Avro schema is required for key and value")
-        return None
+    with metrics.timer('builder.create_avro_producer', stream=stream_name):
+        if value_schema_str is None or key_schema_str is None:
+            logger.error("An Avro schema is required for key and value")
+            return None
 
-    key_schema= avro.loads(key_schema_str)
+        key_schema = load_schema(key_schema_str)
 
-    value_schema = avro.loads(value_schema_str)
-    logger.info("Properly initalized AVRO schema objects for a producer")
+        value_schema = load_schema(value_schema_str)
+        logger.info("Properly initalized AVRO schema objects for a producer")
 
-    registration = client.register_producer(registry_config, stream_name)
-    if registration is None:
-        logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
-        return None
+        registration = client.register_producer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None
 
-    """Traverse the JSON object to get to the actual kafka configuration"""
-    config_elements = registration['regionStreamConfigList'][0]['streamConfiguration']
-    """ Merge stream registry configuration into kafka properties"""
-    properties = __merge_properties(config_elements, kafka_properties)
+        """Traverse the JSON object to get to the actual kafka configuration"""
+        region_config = select_region_config(registration, registry_config)
+        config_elements = region_config['streamConfiguration']
+        """ Merge stream registry configuration into kafka properties"""
+        properties = metrics.apply_statistics(__merge_properties(config_elements, kafka_properties), registry_config)
 
-    # build the avro producer bound to the schema that was passed
-    p = AvroProducer(properties, default_key_schema=key_schema, default_value_schema=value_schema)
-    topic = registration['regionStreamConfigList'][0]['topics'][0]
-    return p, topic
+        # build the avro producer bound to the schema that was passed
+        def factory(props):
+            return AvroProducer(props, default_key_schema=key_schema, default_value_schema=value_schema)
+
+        with metrics.timer('builder.build_producer', shared=shared, avro=True):
+            if shared:
+                p = default_pool.acquire(properties, factory=factory,
+                                         extra_key=('avro', key_schema_str, value_schema_str))
+            else:
+                p = factory(properties)
+        topic = region_config['topics'][0]
+        return p, topic
+
+
+def create_avro_batch_producer(registry_config: Dict[str, str], stream_name: str, key_schema_str: str,
+                               value_schema_str: str, kafka_properties: Dict[str, str] = None, shared: bool = False):
+    """
+    Call this method to create a producer for bulk AVRO production. Records are encoded by an
+    :class:`AvroBatchEncoder` that registers the schemas once per process and reuses a compiled writer for every
+    record, and `produce_batch` encodes a whole list of records in one pass.
+
+    :param dict registry_config: Config parameters, see :func:`create_avro_producer`
+    :param stream_name: The name of the stream to produce to.
+    :param key_schema_str: The AVSC of the message keys, None if the keys are not AVRO encoded.
+    :param value_schema_str: The AVSC of the message values, this CANNOT be None.
+    :param kafka_properties: any kafka producer properties which will be merged with the default from the stream
+                             registry. These need to be valid Kafka configuration properties.
+    :param shared: if True the underlying producer is taken from the process wide producer pool, release it with
+                   `release_producer(batch_producer.producer)`
+    :return: a tuple with the :class:`AvroBatchProducer` and the topic for the stream
+    """
+    with metrics.timer('builder.create_avro_batch_producer', stream=stream_name):
+        if value_schema_str is None:
+            logger.error("An Avro schema is required for the value")
+            return None
+        # parse early so an invalid schema fails before registering
+        load_schema(value_schema_str)
+        if key_schema_str is not None:
+            load_schema(key_schema_str)
+
+        registration = client.register_producer(registry_config, stream_name)
+        if registration is None:
+            logger.error("Unable to create Kafka Consumer since the stream registry did not respond")
+            return None
+
+        """Traverse the JSON object to get to the actual kafka configuration"""
+        region_config = select_region_config(registration, registry_config)
+        config_elements = region_config['streamConfiguration']
+        properties = metrics.apply_statistics(__merge_properties(config_elements, kafka_properties), registry_config)
+        schema_registry = CachedSchemaRegistryClient(properties.pop('schema.registry.url'))
+
+        with metrics.timer('builder.build_producer', shared=shared, avro=True):
+            if shared:
+                p = default_pool.acquire(properties)
+            else:
+                p = Producer(properties)
+        topic = region_config['topics'][0]
+        return AvroBatchProducer(p, AvroBatchEncoder(schema_registry, key_schema_str, value_schema_str)), topic
+
+
+def release_producer(producer, timeout: float = 30.0):
+    """
+    Give back a producer created with `shared=True`. Once no other stream uses it the producer is flushed and
+    closed, until then the call returns without waiting.
+
+    :param producer: the shared producer
+    :param timeout: the maximum number of seconds to wait for the pending messages to be delivered
+    :return: the number of messages still in the producer queue
+    """
+    return default_pool.release(producer, timeout)
 
 
 def __merge_properties(stream_registry_props: Dict[str, str], user_properties: Dict[str, str]):
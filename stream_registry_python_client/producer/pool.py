@@ -0,0 +1,111 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+
+from logzero import logger
+from typing import Dict
+from confluent_kafka import Producer
+
+__all__ = ["ProducerPool", "default_pool"]
+
+DEFAULT_FLUSH_TIMEOUT = 30.0
+
+
+class ProducerPool(object):
+    """
+    A reference counted pool of Kafka producers. Streams whose effective Kafka properties are the same (they live in
+    the same cluster with the same settings) share a single producer, and with it a single set of librdkafka threads,
+    broker connections and buffers. The shared producer is flushed and closed once its last user releases it.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, properties: Dict[str, str], factory=Producer, extra_key=()):
+        """
+        Returns the pooled producer for the given properties, creating it with `factory(properties)` on first use.
+
+        :param properties: the merged Kafka properties of the producer
+        :param factory: the callable that creates a producer out of the properties
+        :param extra_key: anything else, besides the properties, that makes two producers different, producers built
+                          by different factories must use a different key
+        :return: the shared producer
+        """
+        key = (json.dumps(properties, sort_keys=True, default=repr), tuple(extra_key))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                logger.info("Creating a pooled producer for {}".format(properties.get('bootstrap.servers')))
+                entry = [factory(properties), 0]
+                self._entries[key] = entry
+                self._keys[id(entry[0])] = key
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, producer, timeout: float = DEFAULT_FLUSH_TIMEOUT):
+        """
+        Give back a producer obtained from :meth:`acquire`. Only the last release flushes and closes the producer,
+        the others return right away so releasing one stream never waits on the traffic of the other streams.
+
+        :param producer: the producer to release
+        :param timeout: the maximum number of seconds the last release waits for the pending messages to be delivered
+        :return: the number of messages still in the producer queue
+        """
+        with self._lock:
+            key = self._keys.get(id(producer))
+            if key is None:
+                raise ValueError("The producer does not belong to this pool")
+            entry = self._entries[key]
+            entry[1] -= 1
+            last = entry[1] == 0
+            if last:
+                del self._entries[key]
+                del self._keys[id(producer)]
+        if not last:
+            return len(producer)
+        remaining = producer.flush(timeout)
+        _close_producer(producer)
+        return remaining
+
+    def flush(self, timeout: float = DEFAULT_FLUSH_TIMEOUT):
+        """Flush every pooled producer, returns the total number of messages still queued"""
+        with self._lock:
+            producers = [entry[0] for entry in self._entries.values()]
+        return sum(p.flush(timeout) for p in producers)
+
+    def close(self, timeout: float = DEFAULT_FLUSH_TIMEOUT):
+        """Flush and close every pooled producer regardless of its reference count"""
+        with self._lock:
+            producers = [entry[0] for entry in self._entries.values()]
+            self._entries.clear()
+            self._keys.clear()
+        for p in producers:
+            p.flush(timeout)
+            _close_producer(p)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _close_producer(producer):
+    """ Older confluent-kafka releases have no close on producers, the instance is torn down when collected"""
+    close = getattr(producer, 'close', None)
+    if close is not None:
+        close()
+
+
+default_pool = ProducerPool()
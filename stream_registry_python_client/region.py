@@ -0,0 +1,149 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from logzero import logger
+from typing import Dict
+
+__all__ = ["POLICY_FIRST", "POLICY_REGION", "POLICY_LATENCY", "select_region_config", "rank_region_configs",
+           "probe_rtt"]
+
+POLICY_FIRST = 'first'
+POLICY_REGION = 'region'
+POLICY_LATENCY = 'latency'
+
+DEFAULT_PROBE_TIMEOUT = 1.0
+DEFAULT_PROBE_TTL = 300.0
+UNREACHABLE = float('inf')
+
+__probes = {}
+__probes_lock = threading.Lock()
+
+
+def select_region_config(registration, registry_config: Dict[str, str]):
+    """
+    Pick the entry of `regionStreamConfigList` a client should use. The choice is driven by the registry
+    configuration:
+        { 'target_region': (optional) Use the entry of this region when the registry returned one
+          'region_policy': (optional) How to choose otherwise, one of
+                           'region' (default): the entry of the configured `region`, the first entry if there is none
+                           'latency': the entry whose bootstrap servers have the lowest connect round trip time
+                           'first': the first entry
+          'region_failover': (optional) if True, entries whose bootstrap servers cannot be reached are skipped
+          'region_probe_timeout': (optional) Seconds to wait for a bootstrap server to accept a connection
+          'region_probe_ttl': (optional) Seconds a measured round trip time is reused, defaults to 300
+        }
+
+    :param registration: the registration returned by the stream registry
+    :param dict registry_config: the registry configuration
+    :return: the selected region configuration with its 'topics' and 'streamConfiguration'
+    """
+    ranked = rank_region_configs(registration, registry_config)
+    if not ranked:
+        raise ValueError("The registration does not contain any region configuration")
+    if _flag(registry_config.get('region_failover')):
+        timeout = float(registry_config.get('region_probe_timeout', DEFAULT_PROBE_TIMEOUT))
+        ttl = float(registry_config.get('region_probe_ttl', DEFAULT_PROBE_TTL))
+        rtts = __probe_all(ranked, timeout, ttl)
+        for config, rtt in zip(ranked, rtts):
+            if rtt != UNREACHABLE:
+                return config
+        logger.warning("None of the region clusters could be reached, using {}".format(ranked[0].get('region')))
+    return ranked[0]
+
+
+def rank_region_configs(registration, registry_config: Dict[str, str]):
+    """
+    Order the entries of `regionStreamConfigList` by preference, see :func:`select_region_config`. The order is the
+    failover order: the preferred entry first, then the remaining ones by the same criteria.
+
+    :param registration: the registration returned by the stream registry
+    :param dict registry_config: the registry configuration
+    :return: a new list with the region configurations
+    """
+    configs = list(registration.get('regionStreamConfigList') or [])
+    policy = registry_config.get('region_policy', POLICY_REGION)
+    if policy not in (POLICY_FIRST, POLICY_REGION, POLICY_LATENCY):
+        raise ValueError("Unknown region policy {}".format(policy))
+
+    if policy == POLICY_LATENCY and len(configs) > 1:
+        timeout = float(registry_config.get('region_probe_timeout', DEFAULT_PROBE_TIMEOUT))
+        ttl = float(registry_config.get('region_probe_ttl', DEFAULT_PROBE_TTL))
+        rtts = __probe_all(configs, timeout, ttl)
+        order = sorted(range(len(configs)), key=lambda i: (rtts[i], i))
+        configs = [configs[i] for i in order]
+    elif policy == POLICY_REGION:
+        configs = _region_first(configs, registry_config.get('region'))
+
+    target_region = registry_config.get('target_region')
+    if target_region:
+        if not any(c.get('region') == target_region for c in configs):
+            logger.warning("The registry did not return a configuration for region {}".format(target_region))
+        configs = _region_first(configs, target_region)
+    return configs
+
+
+def probe_rtt(bootstrap_servers: str, timeout: float = DEFAULT_PROBE_TIMEOUT, ttl: float = DEFAULT_PROBE_TTL):
+    """
+    Measure the TCP connect round trip time to a cluster, the fastest of its bootstrap servers counts. Results are
+    cached for `ttl` seconds.
+
+    :param bootstrap_servers: a comma separated list of host:port
+    :param timeout: the maximum number of seconds to wait for each connection
+    :param ttl: the number of seconds a measure is reused
+    :return: the round trip time in seconds, `float('inf')` when no server could be reached
+    """
+    now = time.monotonic()
+    with __probes_lock:
+        cached = __probes.get(bootstrap_servers)
+    if cached is not None and now - cached[0] < ttl:
+        return cached[1]
+
+    rtt = UNREACHABLE
+    for server in bootstrap_servers.split(','):
+        server = server.strip()
+        if '://' in server:
+            server = server.split('://', 1)[1]
+        host, _, port = server.rpartition(':')
+        if not host or not port.isdigit():
+            continue
+        start = time.monotonic()
+        try:
+            with socket.create_connection((host.strip('[]'), int(port)), timeout=timeout):
+                rtt = min(rtt, time.monotonic() - start)
+        except OSError as e:
+            logger.debug("Unable to reach bootstrap server {}: {}".format(server, e))
+    with __probes_lock:
+        __probes[bootstrap_servers] = (time.monotonic(), rtt)
+    return rtt
+
+
+def __probe_all(configs, timeout: float, ttl: float):
+    servers = [(c.get('streamConfiguration') or {}).get('bootstrap.servers') for c in configs]
+    with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+        futures = [executor.submit(probe_rtt, s, timeout, ttl) if s else None for s in servers]
+        return [f.result() if f is not None else UNREACHABLE for f in futures]
+
+
+def _region_first(configs, region: str):
+    matching = [c for c in configs if c.get('region') == region]
+    return matching + [c for c in configs if c.get('region') != region]
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.lower() in ('true', '1', 'yes')
+    return bool(value)
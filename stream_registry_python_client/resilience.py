@@ -0,0 +1,297 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import random
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from logzero import logger
+
+import requests
+from typing import Dict
+
+from stream_registry_python_client import metrics
+
+__all__ = ["CircuitOpenError", "DeadlineExceededError", "RetryPolicy", "CircuitBreaker", "LatencyTracker",
+           "ResilientCaller"]
+
+RETRYABLE_STATUS = frozenset([429, 500, 502, 503, 504])
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_BASE = 0.1
+DEFAULT_BACKOFF_MAX = 2.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_HEDGE_DELAY = 1.0
+MIN_HEDGE_SAMPLES = 20
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without calling the registry while the circuit breaker considers it unhealthy"""
+    pass
+
+
+class DeadlineExceededError(requests.Timeout):
+    """Raised when a registry call could not complete before its deadline"""
+    pass
+
+
+class RetryPolicy(object):
+    """
+    Exponential backoff with full jitter.
+
+    :param retries: the number of retries after the first attempt
+    :param backoff_base: the backoff ceiling, in seconds, of the first retry
+    :param backoff_max: the maximum backoff ceiling in seconds
+    """
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int):
+        """Returns the number of seconds to sleep before the retry following the given (zero based) attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class CircuitBreaker(object):
+    """
+    A circuit breaker that opens after a number of consecutive failures. While open every call is rejected until the
+    reset timeout elapses, then a single trial call is let through to decide whether to close the circuit again.
+
+    :param failure_threshold: the number of consecutive failures that opens the circuit
+    :param reset_timeout: the number of seconds the circuit stays open before a trial call is allowed
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True if a call may go through"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Opening the stream registry circuit breaker after {} failures".format(
+                        self._failures))
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker(object):
+    """
+    Keeps a sliding window of call latencies to derive the delay after which a call is hedged.
+
+    :param percentile: the latency percentile (0-100) after which a duplicate request is sent
+    :param default_delay: the delay used until enough samples have been observed
+    :param window: the number of latencies to keep
+    """
+
+    def __init__(self, percentile: float, default_delay: float = DEFAULT_HEDGE_DELAY, window: int = 100):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def threshold(self):
+        """Returns the current hedging delay in seconds"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return self.default_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100.0))
+        return samples[index]
+
+
+class ResilientCaller(object):
+    """
+    Runs registry calls with a deadline, retries with backoff, optional hedging and a circuit breaker.
+
+    :param timeout: the (connect, read) timeout of a single attempt
+    :param deadline: the maximum number of seconds a call may take including retries, None for no deadline
+    :param retry_policy: the :class:`RetryPolicy` to apply
+    :param breaker: the :class:`CircuitBreaker` to apply, None to disable it
+    :param latency_tracker: the :class:`LatencyTracker` that drives hedging, None to disable hedging
+    """
+
+    def __init__(self, timeout, deadline: float = None, retry_policy: RetryPolicy = None,
+                 breaker: CircuitBreaker = None, latency_tracker: LatencyTracker = None):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker
+        self.latency_tracker = latency_tracker
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, registry_config: Dict[str, str], timeout):
+        """
+        Build a caller from the optional resilience settings of a registry configuration:
+            { 'deadline': Seconds a registration may take including retries, no deadline by default
+              'retries': The number of retries on connection errors and 429/5xx responses, defaults to 2
+              'backoff_base': The backoff ceiling in seconds of the first retry, defaults to 0.1
+              'backoff_max': The maximum backoff ceiling in seconds, defaults to 2
+              'circuit_failure_threshold': Consecutive failures that open the circuit, defaults to 5, 0 disables it
+              'circuit_reset_timeout': Seconds the circuit stays open, defaults to 30
+              'hedge_percentile': When set, a duplicate request is sent once a call is slower than this percentile
+                                  of the observed latencies
+              'hedge_delay': The hedging delay in seconds until enough latencies are observed, defaults to 1
+            }
+        """
+        deadline = registry_config.get("deadline")
+        retry_policy = RetryPolicy(int(registry_config.get("retries", DEFAULT_RETRIES)),
+                                   float(registry_config.get("backoff_base", DEFAULT_BACKOFF_BASE)),
+                                   float(registry_config.get("backoff_max", DEFAULT_BACKOFF_MAX)))
+        breaker = None
+        failure_threshold = int(registry_config.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD))
+        if failure_threshold > 0:
+            breaker = CircuitBreaker(failure_threshold,
+                                     float(registry_config.get("circuit_reset_timeout", DEFAULT_RESET_TIMEOUT)))
+        latency_tracker = None
+        if registry_config.get("hedge_percentile") is not None:
+            latency_tracker = LatencyTracker(float(registry_config.get("hedge_percentile")),
+                                             float(registry_config.get("hedge_delay", DEFAULT_HEDGE_DELAY)))
+        return cls(timeout, float(deadline) if deadline is not None else None, retry_policy, breaker,
+                   latency_tracker)
+
+    def call(self, attempt):
+        """
+        Run a registry call.
+
+        :param attempt: a callable that receives the timeout to use and returns a `requests.Response`
+        :return: the first response that is not retryable, or the last response once the retries are exhausted
+        :raises CircuitOpenError: if the circuit breaker is open
+        :raises requests.RequestException: if the last attempt failed with a connection error or timed out
+        """
+        if self.breaker is not None and not self.breaker.allow():
+            metrics.increment('registry.circuit_open')
+            raise CircuitOpenError("The stream registry circuit breaker is open")
+
+        deadline = time.monotonic() + self.deadline if self.deadline is not None else None
+        attempt_number = 0
+        while True:
+            error = None
+            response = None
+            try:
+                response = self._attempt(attempt, deadline)
+            except requests.RequestException as e:
+                error = e
+            if error is None and response.status_code not in RETRYABLE_STATUS:
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                return response
+
+            delay = self.retry_policy.delay(attempt_number)
+            if attempt_number >= self.retry_policy.retries or \
+                    (deadline is not None and time.monotonic() + delay >= deadline):
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+
+            logger.warning("Stream registry call failed ({}), retrying in {:.3f}s".format(
+                error if error is not None else response.status_code, delay))
+            metrics.increment('registry.retries')
+            time.sleep(delay)
+            attempt_number += 1
+
+    def close(self):
+        """Release the threads used for hedged calls"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _attempt(self, attempt, deadline):
+        if self.latency_tracker is None:
+            return self._timed(attempt, self._attempt_timeout(deadline))
+
+        executor = self._hedging_executor()
+        first = executor.submit(self._timed, attempt, self._attempt_timeout(deadline))
+        hedge_delay = self.latency_tracker.threshold()
+        if deadline is not None:
+            hedge_delay = min(hedge_delay, max(0.0, deadline - time.monotonic()))
+        done, _ = wait([first], timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        logger.info("Stream registry call slower than {:.3f}s, sending a hedged request".format(hedge_delay))
+        metrics.increment('registry.hedges')
+        pending = {first, executor.submit(self._timed, attempt, self._attempt_timeout(deadline))}
+        error = None
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceededError("The stream registry call exceeded its deadline")
+            for future in done:
+                try:
+                    return future.result()
+                except requests.RequestException as e:
+                    error = e
+        raise error
+
+    def _timed(self, attempt, timeout):
+        start = time.monotonic()
+        response = attempt(timeout)
+        if self.latency_tracker is not None:
+            self.latency_tracker.record(time.monotonic() - start)
+        return response
+
+    def _attempt_timeout(self, deadline):
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("The stream registry call exceeded its deadline")
+        connect_timeout, read_timeout = self.timeout
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+    def _hedging_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8)
+            return self._executor
@@ -10,11 +10,286 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
 from logzero import logger
 
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict
 
+from stream_registry_python_client import metrics
+from stream_registry_python_client.cache import RegistrationCache, DEFAULT_TTL
+from stream_registry_python_client.resilience import ResilientCaller
+
+__all__ = ["RegistryClient", "AsyncRegistryClient", "RegistrationError", "get_client", "register_consumer",
+           "register_producer", "register_many"]
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+
+CONSUMER_ROLE = 'consumers'
+PRODUCER_ROLE = 'producers'
+
+
+class RegistrationError(Exception):
+    """Raised or reported when the stream registry does not accept a registration"""
+    pass
+
+
+class RegistryClient(object):
+    """
+    A reusable client to the `stream registry api <https://homeaway.github.io/stream-registry/>`_. The client keeps a
+    pooled keep-alive `requests.Session` so registering many streams reuses the same TCP (and TLS) connections instead
+    of opening a new one for every call.
+
+    :param dict registry_config: Config parameters containing the following
+            { 'base_url' : The base URL to the stream service http://streamregistry.org
+              'region' : The string that represents the region where the application is running
+              'app_name': The name of the application
+              'pool_size': (optional) The maximum number of pooled connections to the registry, defaults to 10
+              'connect_timeout': (optional) Seconds to wait for a connection to the registry, defaults to 5
+              'read_timeout': (optional) Seconds to wait for the registry to respond, defaults to 30
+              'cache_dir': (optional) A directory where registrations are persisted so they survive a restart
+              'cache_ttl': (optional) Seconds a cached registration is served without asking the registry, defaults
+                           to 300. Setting it without a `cache_dir` enables an in memory only cache.
+            }
+            The deadline, retry, hedging and circuit breaker settings accepted by
+            :meth:`stream_registry_python_client.resilience.ResilientCaller.from_config` can be added as well.
+    """
+
+    def __init__(self, registry_config: Dict[str, str]):
+        _validate_input(registry_config)
+        self.base_url = registry_config.get("base_url")
+        self.region = registry_config.get("region")
+        self.app_name = registry_config.get("app_name")
+        self.pool_size = int(registry_config.get("pool_size", DEFAULT_POOL_SIZE))
+        self.timeout = (float(registry_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+                        float(registry_config.get("read_timeout", DEFAULT_READ_TIMEOUT)))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.caller = ResilientCaller.from_config(registry_config, self.timeout)
+
+        self.cache = None
+        if registry_config.get("cache_dir") is not None or registry_config.get("cache_ttl") is not None:
+            self.cache = RegistrationCache(registry_config.get("cache_dir"),
+                                           float(registry_config.get("cache_ttl", DEFAULT_TTL)))
+
+    def register_consumer(self, stream_name: str):
+        """
+        Register a consumer to a stream.
+
+        :param stream_name: The name of the stream to consume from
+        :return: a dict object that contains the subscription and configuration binding including the underlying
+                 topic names or None if the registry did not accept the registration
+        """
+        return self._register(CONSUMER_ROLE, stream_name)
+
+    def register_producer(self, stream_name: str):
+        """
+        Register a producer to a stream.
+
+        :param stream_name: The name of the stream to produce to
+        :return: a dict object that contains the subscription and configuration binding including the underlying
+                 topic name or None if the registry did not accept the registration
+        """
+        return self._register(PRODUCER_ROLE, stream_name)
+
+    def register_many(self, stream_names, role: str = CONSUMER_ROLE, max_workers: int = None):
+        """
+        Register this application to many streams at once. The registrations are issued concurrently with a bounded
+        number of workers sharing this client's connection pool.
+
+        :param stream_names: an iterable with the names of the streams to register to
+        :param role: either `restclient.CONSUMER_ROLE` (default) or `restclient.PRODUCER_ROLE`
+        :param max_workers: the maximum number of concurrent registrations, defaults to the pool size
+        :return: a tuple of two dicts, the registrations by stream name and the errors by stream name. Every stream
+                 will be in exactly one of them.
+        """
+        if role not in (CONSUMER_ROLE, PRODUCER_ROLE):
+            raise ValueError("Unknown registration role {}".format(role))
+        stream_names = list(stream_names)
+        results = {}
+        errors = {}
+        if not stream_names:
+            return results, errors
+
+        workers = min(max_workers or self.pool_size, len(stream_names))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {stream_name: executor.submit(self._register, role, stream_name)
+                       for stream_name in stream_names}
+            for stream_name, future in futures.items():
+                try:
+                    registration = future.result()
+                except Exception as e:
+                    logger.error("Registration of {} to stream {} failed: {}".format(role, stream_name, e))
+                    errors[stream_name] = e
+                    continue
+                if registration is None:
+                    errors[stream_name] = RegistrationError(
+                        "The stream registry did not accept the registration to {}".format(stream_name))
+                else:
+                    results[stream_name] = registration
+        return results, errors
+
+    def close(self):
+        """Release the pooled connections held by this client"""
+        self.caller.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _register(self, role: str, stream_name: str):
+        if not stream_name:
+            logger.error("The name of the stream name is requred")
+            raise ValueError("The name of the stream name is requred")
+
+        if self.cache is None:
+            return self._request(role, stream_name)
+
+        key = (self.base_url, stream_name, self.app_name, self.region, role)
+        registration = self.cache.get(key)
+        if registration is not None:
+            logger.debug("Serving the {} registration to {} from the cache".format(role, stream_name))
+            metrics.increment('registry.cache.hits', role=role)
+            return registration
+        metrics.increment('registry.cache.misses', role=role)
+        try:
+            registration = self._request(role, stream_name)
+        except requests.RequestException:
+            registration = self.cache.get(key, allow_stale=True)
+            if registration is None:
+                raise
+            logger.warning("The stream registry failed, using a stale {} registration to {}".format(role, stream_name))
+            metrics.increment('registry.cache.stale', role=role)
+            return registration
+        if registration is None:
+            registration = self.cache.get(key, allow_stale=True)
+            if registration is not None:
+                metrics.increment('registry.cache.stale', role=role)
+                logger.warning("The stream registry failed, using a stale {} registration to {}".format(
+                    role, stream_name))
+            return registration
+        self.cache.put(key, registration)
+        return registration
+
+    def refresh(self, role: str, stream_name: str, etag: str = None):
+        """
+        Query a registration again, bypassing the cache for the read but updating it with the answer. When an `etag`
+        from a previous refresh is given the request is conditional: a registry that supports it answers a matching
+        PUT with 412 Precondition Failed (RFC 7232), or 304 Not Modified, without a body.
+
+        :param role: either `restclient.CONSUMER_ROLE` or `restclient.PRODUCER_ROLE`
+        :param stream_name: The name of the stream
+        :param etag: the ETag returned by the previous refresh, if any
+        :return: a tuple of the registration (None when it was not modified) and the ETag of the answer
+        :raises RegistrationError: if the registry did not accept the registration
+        """
+        headers = {'If-None-Match': etag} if etag else None
+        request_url = self._url(role, stream_name)
+        with metrics.timer('registry.refresh', role=role):
+            response = self.caller.call(lambda timeout: self.session.put(request_url, timeout=timeout,
+                                                                         headers=headers))
+        if etag and response.status_code in (304, 412):
+            metrics.increment('registry.not_modified', role=role)
+            return None, etag
+        if not response.ok:
+            metrics.increment('registry.failures', role=role, status=response.status_code)
+            raise RegistrationError("Unable to refresh the {} registration to {}: {} {}".format(
+                role, stream_name, response.status_code, response.text))
+        registration = response.json()
+        if self.cache is not None:
+            self.cache.put((self.base_url, stream_name, self.app_name, self.region, role), registration)
+        return registration, response.headers.get('ETag')
+
+    def _url(self, role: str, stream_name: str):
+        return "{}/v0/streams/{}/{}/{}/regions/{}".format(self.base_url, stream_name, role, self.app_name, self.region)
+
+    def _request(self, role: str, stream_name: str):
+        request_url = self._url(role, stream_name)
+        with metrics.timer('registry.request', role=role):
+            response = self.caller.call(lambda timeout: self.session.put(request_url, timeout=timeout))
+        if not response.ok:
+            metrics.increment('registry.failures', role=role, status=response.status_code)
+            logger.error("Unable to register {} into the stream registry {} with {}".format(
+                role, response.status_code, response.text))
+            return None
+        return response.json()
+
+
+class AsyncRegistryClient(object):
+    """
+    The asyncio flavour of :class:`RegistryClient`. It exposes the same API as coroutines, the HTTP calls run on the
+    pooled session from a bounded thread pool so the event loop is never blocked waiting on the registry.
+
+    :param dict registry_config: same configuration accepted by :class:`RegistryClient`
+    :param loop: the event loop to run on, defaults to the current event loop
+    """
+
+    def __init__(self, registry_config: Dict[str, str], loop=None):
+        self.client = RegistryClient(registry_config)
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(max_workers=self.client.pool_size)
+
+    async def register_consumer(self, stream_name: str):
+        """Coroutine version of :meth:`RegistryClient.register_consumer`"""
+        return await self._run(self.client.register_consumer, stream_name)
+
+    async def register_producer(self, stream_name: str):
+        """Coroutine version of :meth:`RegistryClient.register_producer`"""
+        return await self._run(self.client.register_producer, stream_name)
+
+    async def register_many(self, stream_names, role: str = CONSUMER_ROLE, max_workers: int = None):
+        """Coroutine version of :meth:`RegistryClient.register_many`"""
+        return await self._run(self.client.register_many, list(stream_names), role, max_workers)
+
+    def close(self):
+        """Release the worker threads and the pooled connections held by this client"""
+        self.executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def _run(self, fn, *args):
+        loop = self.loop or asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+
+__clients = {}
+__clients_lock = threading.Lock()
+
+
+def get_client(registry_config: Dict[str, str]):
+    """
+    Returns the process wide :class:`RegistryClient` for the given configuration, creating it on first use. Reusing
+    the client keeps the registry connections alive across registrations.
+
+    :param dict registry_config: the registry configuration, see :class:`RegistryClient`
+    :return: a shared RegistryClient
+    """
+    _validate_input(registry_config)
+    key = tuple(sorted((k, repr(v)) for k, v in registry_config.items()))
+    with __clients_lock:
+        client = __clients.get(key)
+        if client is None:
+            client = RegistryClient(registry_config)
+            __clients[key] = client
+    return client
+
 
 def register_consumer(registry_config: Dict[str, str], stream_name: str):
     """
@@ -31,21 +306,7 @@ def register_consumer(registry_config: Dict[str, str], stream_name: str):
     :param stream_name: The name of the stream to consume from
     :return: a dict object that contains the subscription and configuration binding including the underlying topic names
     """
-    __validate_input(registry_config)
-    url = registry_config.get("base_url")
-    region = registry_config.get("region")
-    appname = registry_config.get("app_name")
-    if not stream_name:
-        logger.error("The name of the stream name is requred")
-        raise ValueError("The name of the stream name is requred")
-
-    request_url = "{}/v0/streams/{}/consumers/{}/regions/{}".format(url, stream_name, appname, region)
-    response = requests.put(request_url)
-    if not response.ok:
-        logger.error("Unable to register consumer into the stream registry {} with {}".format(
-            response.status_code, response.text))
-        return None
-    return response.json()
+    return get_client(registry_config).register_consumer(stream_name)
 
 
 def register_producer(registry_config: Dict[str, str], stream_name: str):
@@ -63,25 +324,23 @@ def register_producer(registry_config: Dict[str, str], stream_name: str):
     :param stream_name: The name of the stream to produce to
     :return: a dict object that contains the subscription and configuration binding including the underlying topic name
     """
-    __validate_input(registry_config)
-    url = registry_config.get("base_url")
-    region = registry_config.get("region")
-    appname = registry_config.get("app_name")
+    return get_client(registry_config).register_producer(stream_name)
 
-    if not stream_name:
-        logger.error("The name of the stream name is requred")
-        raise ValueError("The name of the stream name is requred")
 
-    request_url = "{}/v0/streams/{}/producers/{}/regions/{}".format(url, stream_name, appname, region)
-    response = requests.put(request_url)
-    if not response.ok:
-        logger.error("Unable to register consumer into the stream registry {} with {}".format(
-            response.status_code, response.text))
-        return None
-    return response.json()
+def register_many(registry_config: Dict[str, str], stream_names, role: str = CONSUMER_ROLE, max_workers: int = None):
+    """
+    Invoke this function to register an application to many streams concurrently.
+
+    :param dict registry_config: the registry configuration, see :func:`register_consumer`
+    :param stream_names: an iterable with the names of the streams to register to
+    :param role: either `restclient.CONSUMER_ROLE` (default) or `restclient.PRODUCER_ROLE`
+    :param max_workers: the maximum number of concurrent registrations, defaults to the client pool size
+    :return: a tuple of two dicts, the registrations by stream name and the errors by stream name
+    """
+    return get_client(registry_config).register_many(stream_names, role, max_workers)
 
 
-def __validate_input(registry_config: Dict[str, str]):
+def _validate_input(registry_config: Dict[str, str]):
     url = registry_config.get("base_url")
     if url is None or not url:
         logger.error("A base_url configuration parameter is required to consume a stream")
@@ -93,4 +352,4 @@ def __validate_input(registry_config: Dict[str, str]):
     appname = registry_config.get("app_name")
     if appname is None or not appname:
         logger.error("The name of the consuming application needs to be defined in the configuration")
-        raise ValueError("The current running region needs to be identified for starting a consumer")
\ No newline at end of file
+        raise ValueError("The current running region needs to be identified for starting a consumer")
@@ -0,0 +1,246 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+
+from logzero import logger
+from typing import Dict
+
+import stream_registry_python_client.restclient as client
+from stream_registry_python_client.region import select_region_config
+
+__all__ = ["TopologyChange", "TopologyWatcher", "WatchedConsumer", "default_watcher"]
+
+DEFAULT_INTERVAL = 60.0
+
+
+class TopologyChange(object):
+    """
+    The difference between two registrations of a stream.
+
+    :param stream_name: the name of the stream
+    :param old: the previous registration
+    :param new: the current registration
+    :param dict registry_config: the registry configuration that selects the region configuration of the client
+    """
+
+    def __init__(self, stream_name: str, old, new, registry_config: Dict[str, str]):
+        self.stream_name = stream_name
+        self.old = old
+        self.new = new
+        old_config = select_region_config(old, registry_config)
+        new_config = select_region_config(new, registry_config)
+        old_topics = old_config.get('topics') or []
+        new_topics = new_config.get('topics') or []
+        self.topics = list(new_topics)
+        self.added_topics = [t for t in new_topics if t not in old_topics]
+        self.removed_topics = [t for t in old_topics if t not in new_topics]
+        self.configuration_changed = old_config.get('streamConfiguration') != new_config.get('streamConfiguration')
+
+    @property
+    def topics_changed(self):
+        return bool(self.added_topics or self.removed_topics)
+
+    def __bool__(self):
+        return self.topics_changed or self.configuration_changed
+
+    def __repr__(self):
+        return "TopologyChange({}, added={}, removed={}, configuration_changed={})".format(
+            self.stream_name, self.added_topics, self.removed_topics, self.configuration_changed)
+
+
+class WatchedConsumer(object):
+    """
+    A consumer whose subscription is kept up to date by a :class:`TopologyWatcher`. It behaves like the wrapped
+    consumer, closing it also stops watching its stream so the watcher neither keeps it alive nor refreshes its
+    registration anymore.
+
+    :param consumer: the subscribed consumer
+    :param watcher: the watcher
+    :param watch: the handle returned by :meth:`TopologyWatcher.watch_consumer`
+    """
+
+    def __init__(self, consumer, watcher, watch):
+        self.consumer = consumer
+        self.watcher = watcher
+        self.watch = watch
+
+    def close(self, *args, **kwargs):
+        """Stop watching the stream and close the consumer"""
+        self.watcher.unwatch(self.watch)
+        return self.consumer.close(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.consumer, name)
+
+
+class _Watch(object):
+    def __init__(self, key, on_change):
+        self.key = key
+        self.on_change = on_change
+
+
+class _Target(object):
+    """A registration watched by one or more clients, it is refreshed once per cycle whatever the number of clients"""
+
+    def __init__(self, registry_config, role, stream_name, registration):
+        self.registry_config = registry_config
+        self.role = role
+        self.stream_name = stream_name
+        self.registration = registration
+        self.etag = None
+        self.watches = []
+
+
+class TopologyWatcher(object):
+    """
+    A single background thread that periodically refreshes the registrations of the live clients and notifies them
+    when the topics or the configuration of their stream change. Clients of the same stream share one (conditional,
+    when the registry supports ETags) request per cycle, and nothing is notified unless the registration changed.
+
+    :param interval: the number of seconds between two refreshes
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def watch(self, registry_config: Dict[str, str], stream_name: str, on_change, registration=None,
+              role: str = client.CONSUMER_ROLE):
+        """
+        Watch the registration of a stream.
+
+        :param dict registry_config: the registry configuration used to create the client
+        :param stream_name: the name of the stream
+        :param on_change: a callable invoked from the watcher thread with a :class:`TopologyChange`
+        :param registration: the registration the client was created with, the first refresh becomes the baseline
+                             when it is None
+        :param role: either `restclient.CONSUMER_ROLE` (default) or `restclient.PRODUCER_ROLE`
+        :return: a handle to pass to :meth:`unwatch`
+        """
+        key = (_config_key(registry_config), role, stream_name)
+        watch = _Watch(key, on_change)
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:
+                target = _Target(registry_config, role, stream_name, registration)
+                self._targets[key] = target
+            elif target.registration is None:
+                target.registration = registration
+            target.watches.append(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stream-topology-watcher', daemon=True)
+                self._thread.start()
+        return watch
+
+    def watch_consumer(self, consumer, registry_config: Dict[str, str], stream_name: str, registration=None,
+                       on_change=None, subscribe=None):
+        """
+        Keep the subscription of a consumer in line with the topics of its stream. The consumer is resubscribed,
+        which triggers a rebalance, only when topics were added or removed. Configuration changes that require a new
+        consumer are reported to `on_change` so the caller can rebuild it.
+
+        :param consumer: the subscribed consumer
+        :param dict registry_config: the registry configuration used to create the consumer
+        :param stream_name: the name of the stream
+        :param registration: the registration the consumer was created with
+        :param on_change: an optional callable invoked with every :class:`TopologyChange` after the resubscription
+        :param subscribe: the callable that subscribes to a list of topics, defaults to `consumer.subscribe`. Pass
+                          `CommitManager.subscribe` to keep its rebalance callbacks.
+        :return: a handle to pass to :meth:`unwatch`
+        """
+        subscribe = subscribe or consumer.subscribe
+
+        def resubscribe(change):
+            if change.topics_changed:
+                logger.info("Topics of stream {} changed (added {}, removed {}), resubscribing".format(
+                    stream_name, change.added_topics, change.removed_topics))
+                subscribe(change.topics)
+            if on_change is not None:
+                on_change(change)
+
+        return self.watch(registry_config, stream_name, resubscribe, registration, client.CONSUMER_ROLE)
+
+    def unwatch(self, watch):
+        """Stop notifying the client that obtained the handle"""
+        with self._lock:
+            target = self._targets.get(watch.key)
+            if target is None:
+                return
+            if watch in target.watches:
+                target.watches.remove(watch)
+            if not target.watches:
+                del self._targets[watch.key]
+
+    def refresh(self):
+        """
+        Refresh every watched registration once and notify the clients of the ones that changed.
+
+        :return: the list of :class:`TopologyChange` found
+        """
+        with self._lock:
+            targets = list(self._targets.values())
+        changes = []
+        for target in targets:
+            try:
+                registry = client.get_client(target.registry_config)
+                registration, etag = registry.refresh(target.role, target.stream_name, target.etag)
+            except Exception as e:
+                logger.warning("Unable to refresh the registration of stream {}: {}".format(target.stream_name, e))
+                continue
+            target.etag = etag
+            if registration is None:
+                continue
+            previous = target.registration
+            target.registration = registration
+            if previous is None or _fingerprint(previous) == _fingerprint(registration):
+                continue
+            change = TopologyChange(target.stream_name, previous, registration, target.registry_config)
+            if not change:
+                continue
+            changes.append(change)
+            with self._lock:
+                watches = list(target.watches)
+            for watch in watches:
+                try:
+                    watch.on_change(change)
+                except Exception as e:
+                    logger.error("Topology change handler of stream {} failed: {}".format(target.stream_name, e))
+        return changes
+
+    def stop(self):
+        """Stop the background thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wakeup.set()
+            thread.join()
+            self._wakeup.clear()
+
+    def _run(self):
+        while not self._wakeup.wait(self.interval):
+            self.refresh()
+
+
+def _config_key(registry_config: Dict[str, str]):
+    return tuple(sorted((k, repr(v)) for k, v in registry_config.items()))
+
+
+def _fingerprint(registration):
+    return json.dumps(registration.get('regionStreamConfigList'), sort_keys=True, default=repr)
+
+
+default_watcher = TopologyWatcher()
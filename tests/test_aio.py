@@ -0,0 +1,82 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import unittest
+
+from unittest import mock
+
+from confluent_kafka import KafkaException
+
+from stream_registry_python_client.consumer.aio import AsyncConsumer
+from stream_registry_python_client.producer.aio import AsyncProducer
+
+
+class FakeProducer(object):
+    """Reports every produced message on the next poll, values equal to b'fail' are reported as failed"""
+
+    def __init__(self):
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def produce(self, topic, value=None, key=None, on_delivery=None):
+        with self.lock:
+            self.pending.append((value, on_delivery))
+
+    def poll(self, timeout):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for value, on_delivery in pending:
+            msg = mock.Mock()
+            msg.value.return_value = value
+            on_delivery('boom' if value == b'fail' else None, msg)
+        return len(pending)
+
+    def flush(self, timeout):
+        return 0
+
+
+class TestAio(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def test_produce_resolves_on_delivery(self):
+        producer = AsyncProducer(FakeProducer(), loop=self.loop, poll_interval=0.01)
+
+        async def scenario():
+            delivered = await asyncio.gather(*[producer.produce('topic', value=str(i).encode()) for i in range(50)])
+            with self.assertRaises(KafkaException):
+                await producer.produce('topic', value=b'fail')
+            await producer.close()
+            return [msg.value() for msg in delivered]
+
+        self.assertEqual([str(i).encode() for i in range(50)], self.loop.run_until_complete(scenario()))
+
+    def test_consumer_async_iteration(self):
+        consumer = mock.Mock()
+        messages = [mock.Mock(), mock.Mock()]
+        consumer.poll.side_effect = [None, messages[0], None, messages[1]]
+        async_consumer = AsyncConsumer(consumer, loop=self.loop, poll_timeout=0.01)
+
+        async def scenario():
+            received = []
+            async for msg in async_consumer:
+                received.append(msg)
+                if len(received) == 2:
+                    await async_consumer.close()
+            return received
+
+        self.assertEqual(messages, self.loop.run_until_complete(scenario()))
+        consumer.close.assert_called_once_with()
@@ -0,0 +1,85 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import struct
+import unittest
+
+from unittest import mock
+
+import avro.io
+import avro.schema
+
+import stream_registry_python_client.consumer.avro_decoder as avro_decoder
+from stream_registry_python_client.consumer.avro_decoder import AvroBatchDecoder, AvroDecodeError
+
+SCHEMA = avro.schema.parse("""
+{"namespace": "my.test", "name": "value", "type": "record",
+ "fields": [{"name": "name", "type": "string"}, {"name": "count", "type": "long"}]}
+""")
+
+
+def encode(schema_id, record):
+    out = io.BytesIO()
+    out.write(struct.pack('>bI', 0, schema_id))
+    avro.io.DatumWriter(SCHEMA).write(record, avro.io.BinaryEncoder(out))
+    return out.getvalue()
+
+
+def message(value, key=None):
+    msg = mock.Mock()
+    msg.key.return_value = key
+    msg.value.return_value = value
+    return msg
+
+
+class TestAvroBatchDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = mock.Mock()
+        self.registry.get_by_id.return_value = SCHEMA
+
+    def test_decode_batch(self):
+        decoder = AvroBatchDecoder(self.registry)
+        messages = [message(encode(7, {'name': 'n{}'.format(i), 'count': i}), key=encode(7, {'name': 'k', 'count': 0}))
+                    for i in range(10)]
+        messages.append(message(None))
+        decoded = decoder.decode_batch(messages)
+        self.assertEqual(({'name': 'k', 'count': 0}, {'name': 'n3', 'count': 3}), decoded[3])
+        self.assertEqual((None, None), decoded[-1])
+        self.registry.get_by_id.assert_called_once_with(7)
+
+    def test_decode_batch_in_process_pool_keeps_order(self):
+        decoder = AvroBatchDecoder(self.registry, workers=2, decode_keys=False)
+        self.addCleanup(decoder.close)
+        messages = [message(encode(1, {'name': 'n', 'count': i}), key=b'raw') for i in range(1200)]
+        decoded = decoder.decode_batch(messages)
+        self.assertEqual(list(range(1200)), [value['count'] for _, value in decoded])
+        self.assertEqual(b'raw', decoded[0][0])
+
+    def test_rejects_unframed_payloads(self):
+        with self.assertRaises(AvroDecodeError):
+            AvroBatchDecoder(self.registry).decode(b'\x01\x00\x00\x00\x01abc')
+
+    @unittest.skipUnless(avro_decoder.HAS_FAST, "fastavro is not installed")
+    def test_fastavro_reader_round_trip(self):
+        with mock.patch.object(avro_decoder, 'schemaless_reader', wraps=avro_decoder.schemaless_reader) as fast:
+            reader = avro_decoder._compile_reader(str(SCHEMA))
+            payload = encode(3, {'name': 'fast', 'count': 42})
+            self.assertEqual({'name': 'fast', 'count': 42}, reader(io.BytesIO(payload[avro_decoder.HEADER_SIZE:])))
+        fast.assert_called_once_with(mock.ANY, mock.ANY)
+
+    def test_avro_reader_round_trip(self):
+        with mock.patch.object(avro_decoder, 'HAS_FAST', False):
+            reader = avro_decoder._compile_reader(str(SCHEMA))
+        payload = encode(3, {'name': 'slow', 'count': 7})
+        self.assertEqual({'name': 'slow', 'count': 7}, reader(io.BytesIO(payload[avro_decoder.HEADER_SIZE:])))
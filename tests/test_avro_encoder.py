@@ -0,0 +1,83 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import unittest
+
+from unittest import mock
+
+import avro.io
+
+from stream_registry_python_client.consumer.avro_decoder import AvroBatchDecoder
+import stream_registry_python_client.producer.avro_encoder as avro_encoder
+from stream_registry_python_client.producer.avro_encoder import load_schema, AvroBatchEncoder, AvroBatchProducer
+
+KEY_SCHEMA = '{"namespace": "my.test", "name": "key", "type": "record", "fields": [{"name": "id", "type": "long"}]}'
+VALUE_SCHEMA = '{"namespace": "my.test", "name": "value", "type": "record", ' \
+               '"fields": [{"name": "name", "type": "string"}]}'
+
+
+class TestAvroBatchEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = mock.Mock()
+        self.registry.url = 'http://registry-{}'.format(id(self))
+        self.registry.register.side_effect = lambda subject, schema: 11 if subject.endswith('-key') else 12
+        self.registry.get_by_id.side_effect = lambda schema_id: load_schema(KEY_SCHEMA if schema_id == 11
+                                                                            else VALUE_SCHEMA)
+
+    def test_load_schema_is_cached(self):
+        self.assertIs(load_schema(VALUE_SCHEMA), load_schema(VALUE_SCHEMA))
+
+    def test_round_trip_and_single_registration(self):
+        encoder = AvroBatchEncoder(self.registry, KEY_SCHEMA, VALUE_SCHEMA)
+        records = [({'id': i}, {'name': 'n{}'.format(i)}) for i in range(5)] + [(None, None)]
+        encoded = encoder.encode_batch('topic', records)
+        encoder.encode('topic', {'id': 9}, {'name': 'again'})
+        self.assertEqual(2, self.registry.register.call_count)
+
+        messages = []
+        for key, value in encoded:
+            msg = mock.Mock()
+            msg.key.return_value = key
+            msg.value.return_value = value
+            messages.append(msg)
+        self.assertEqual(records, AvroBatchDecoder(self.registry).decode_batch(messages))
+
+    def test_produce_batch_waits_for_room(self):
+        producer = mock.Mock()
+        producer.produce.side_effect = [None, BufferError(), None]
+        batch_producer = AvroBatchProducer(producer, AvroBatchEncoder(self.registry, None, VALUE_SCHEMA))
+        self.assertEqual(2, batch_producer.produce_batch('topic', [(b'k1', {'name': 'a'}), (b'k2', {'name': 'b'})]))
+        self.assertEqual(3, producer.produce.call_count)
+        self.assertEqual(b'k2', producer.produce.call_args[1]['key'])
+        producer.poll.assert_any_call(1.0)
+
+    @unittest.skipUnless(avro_encoder.HAS_FAST, "fastavro is not installed")
+    def test_fastavro_writer_round_trip(self):
+        with mock.patch.object(avro_encoder, 'schemaless_writer', wraps=avro_encoder.schemaless_writer) as fast:
+            writer = avro_encoder._compile_writer(VALUE_SCHEMA)
+            out = io.BytesIO()
+            writer(out, {'name': 'fast'})
+        fast.assert_called_once_with(out, mock.ANY, {'name': 'fast'})
+        out.seek(0)
+        decoded = avro.io.DatumReader(load_schema(VALUE_SCHEMA)).read(avro.io.BinaryDecoder(out))
+        self.assertEqual({'name': 'fast'}, decoded)
+
+    def test_avro_writer_round_trip(self):
+        with mock.patch.object(avro_encoder, 'HAS_FAST', False):
+            writer = avro_encoder._compile_writer(VALUE_SCHEMA)
+        out = io.BytesIO()
+        writer(out, {'name': 'slow'})
+        out.seek(0)
+        decoded = avro.io.DatumReader(load_schema(VALUE_SCHEMA)).read(avro.io.BinaryDecoder(out))
+        self.assertEqual({'name': 'slow'}, decoded)
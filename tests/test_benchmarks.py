@@ -0,0 +1,47 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import run
+from benchmarks.registry import StandInRegistry
+from stream_registry_python_client.restclient import RegistryClient
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_stand_in_registry(self):
+        registry = StandInRegistry('127.0.0.1:9092')
+        self.addCleanup(registry.close)
+        with RegistryClient(registry.registry_config()) as client:
+            registration = client.register_producer('orders')
+        config = registration['regionStreamConfigList'][0]
+        self.assertEqual(['orders'], config['topics'])
+        self.assertEqual(registry.base_url, config['streamConfiguration']['schema.registry.url'])
+        self.assertEqual(1, registry.registrations)
+
+    def test_report_written_and_compared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            args = ['--benchmarks', 'registration', 'avro', '--registrations', '5', '--avro-records', '10',
+                    '--brokers', '1', '--output', output]
+            run.main(args)
+            with open(output) as f:
+                report = json.load(f)
+            self.assertEqual(['avro', 'registration'], sorted(report['results']))
+            self.assertEqual(10, report['results']['avro']['decode']['messages'])
+
+            compared = run.main(args[:-1] + [os.path.join(tmp, 'second.json'), '--compare', output])
+            self.assertIn('registration.uncached.mean_ms', compared['changes'])
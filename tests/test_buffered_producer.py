@@ -0,0 +1,118 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import unittest
+
+from unittest import mock
+
+from stream_registry_python_client.producer.buffered import apply_profile, BufferedProducer
+
+
+class FakeProducer(object):
+    """
+    Accepts `capacity` messages, each poll sends one queued message, failing the values in `failing` once they were
+    sent like a broker rejection, and emits the statistics
+    """
+
+    def __init__(self, properties, capacity=1, failing=(b'bad',)):
+        self.properties = properties
+        self.on_delivery = properties['on_delivery']
+        self.stats_cb = properties['stats_cb']
+        self.capacity = capacity
+        self.failing = failing
+        self.queue = []
+        self.txmsgs = 0
+        self.txmsg_bytes = 0
+
+    def produce(self, topic, value=None, key=None):
+        if len(self.queue) >= self.capacity:
+            raise BufferError('Local: Queue full')
+        self.queue.append(value)
+
+    def poll(self, timeout):
+        served = 0
+        if self.queue:
+            msg = mock.Mock()
+            msg.value.return_value = value = self.queue.pop(0)
+            self.txmsgs += 1
+            self.txmsg_bytes += len(value)
+            if value in self.failing:
+                self.on_delivery('Broker: Message too large', msg)
+            elif not self.properties.get('delivery.report.only.error'):
+                self.on_delivery(None, msg)
+            served = 1
+        self.stats_cb(json.dumps({'txmsgs': self.txmsgs, 'txmsg_bytes': self.txmsg_bytes}))
+        return served
+
+    def flush(self, timeout):
+        while self.queue:
+            self.poll(0)
+        return 0
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class TestBufferedProducer(unittest.TestCase):
+
+    def test_profile_keeps_explicit_properties(self):
+        properties = apply_profile({'bootstrap.servers': 'b', 'linger.ms': 1}, 'throughput')
+        self.assertEqual(1, properties['linger.ms'])
+        self.assertEqual('lz4', properties['compression.type'])
+        with self.assertRaises(ValueError):
+            apply_profile({}, 'unknown')
+
+    def test_produce_waits_for_room(self):
+        producer = BufferedProducer({}, poll_interval=0.01, producer_factory=FakeProducer)
+        for i in range(20):
+            producer.produce('topic', value=b'value', timeout=5)
+        self.assertEqual(0, producer.close())
+        self.assertEqual({'transmitted': 20, 'failed': 0, 'transmitted_bytes': 100, 'last_error': None},
+                         producer.stats.snapshot())
+        self.assertTrue(producer.producer.properties['delivery.report.only.error'])
+
+    def test_only_failures_call_back(self):
+        user_reports = []
+        producer = BufferedProducer({'on_delivery': lambda err, msg: user_reports.append(err)}, poll_interval=0.01,
+                                    producer_factory=FakeProducer)
+        for value in (b'good', b'bad', b'good'):
+            producer.produce('topic', value=value, timeout=5)
+        producer.close()
+        self.assertNotIn('delivery.report.only.error', producer.producer.properties)
+        self.assertEqual([None, 'Broker: Message too large', None], user_reports)
+        # the rejected message was sent, it counts as transmitted as well as failed
+        self.assertEqual({'transmitted': 3, 'failed': 1, 'transmitted_bytes': 11,
+                          'last_error': 'Broker: Message too large'}, producer.stats.snapshot())
+
+    def test_produce_times_out(self):
+        def stuck_producer(properties):
+            fake = FakeProducer(properties)
+            fake.poll = mock.Mock(return_value=0)
+            return fake
+        producer = BufferedProducer({}, poll_interval=0.01, producer_factory=stuck_producer)
+        producer.produce('topic', value=b'value')
+        with self.assertRaises(BufferError):
+            producer.produce('topic', value=b'value', timeout=0.05)
+        producer._closed.set()
+
+    def test_produce_async(self):
+        producer = BufferedProducer({}, poll_interval=0.01, producer_factory=FakeProducer)
+        loop = asyncio.new_event_loop()
+        try:
+            for i in range(5):
+                loop.run_until_complete(producer.produce_async('topic', value=b'v', timeout=5))
+        finally:
+            loop.close()
+        producer.close()
+        self.assertEqual(5, producer.stats.snapshot()['transmitted'])
@@ -0,0 +1,55 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from stream_registry_python_client.cache import RegistrationCache
+
+KEY = ('http://localhost', 'teststream', 'someappname', 'someregion', 'consumers')
+
+
+class TestRegistrationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_persisted_across_instances(self):
+        RegistrationCache(self.tmp.name).put(KEY, {'regionStreamConfigList': []})
+        self.assertEqual({'regionStreamConfigList': []}, RegistrationCache(self.tmp.name).get(KEY))
+        self.assertEqual([], [f for f in os.listdir(self.tmp.name) if f.endswith('.tmp')])
+
+    def test_unserialisable_entry_leaves_no_temporary_file(self):
+        cache = RegistrationCache(self.tmp.name)
+        cache.put(KEY, {'v': object()})
+        self.assertEqual([], os.listdir(self.tmp.name))
+        self.assertIsNone(RegistrationCache(self.tmp.name).get(KEY))
+
+    def test_expired_entry_only_served_stale(self):
+        cache = RegistrationCache(self.tmp.name, ttl=10)
+        with mock.patch('time.time', return_value=1000.0):
+            cache.put(KEY, {'v': 1})
+        with mock.patch('time.time', return_value=1011.0):
+            self.assertIsNone(cache.get(KEY))
+            self.assertEqual({'v': 1}, cache.get(KEY, allow_stale=True))
+
+    def test_memory_only(self):
+        cache = RegistrationCache()
+        self.assertIsNone(cache.get(KEY))
+        cache.put(KEY, {'v': 1})
+        self.assertEqual({'v': 1}, cache.get(KEY))
@@ -0,0 +1,95 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from unittest import mock
+
+from confluent_kafka import TopicPartition
+
+from stream_registry_python_client.consumer.commit import CommitManager
+
+
+def message(partition, offset):
+    msg = mock.Mock()
+    msg.topic.return_value = 'topic'
+    msg.partition.return_value = partition
+    msg.offset.return_value = offset
+    msg.error.return_value = None
+    return msg
+
+
+def committed(consumer):
+    return sorted((tp.partition, tp.offset) for tp in consumer.commit.call_args[1]['offsets'])
+
+
+class TestCommitManager(unittest.TestCase):
+
+    def test_commits_highest_contiguous_offset(self):
+        consumer = mock.Mock()
+        manager = CommitManager(consumer, commit_every=3, commit_interval=3600)
+        messages = [message(0, offset) for offset in (10, 11, 12)] + [message(1, 5)]
+        for msg in messages:
+            manager.track(msg)
+        manager.done(messages[2])
+        manager.done(messages[3])
+        consumer.commit.assert_not_called()
+        manager.done(messages[0])
+        self.assertEqual([(0, 11), (1, 6)], committed(consumer))
+        self.assertTrue(consumer.commit.call_args[1]['asynchronous'])
+
+        manager.done(messages[1])
+        manager.close()
+        self.assertEqual([(0, 13), (1, 6)], committed(consumer))
+        self.assertFalse(consumer.commit.call_args[1]['asynchronous'])
+        consumer.close.assert_called_once_with()
+
+    def test_revoke_commits_and_forgets_partitions(self):
+        consumer = mock.Mock()
+        manager = CommitManager(consumer, commit_every=100)
+        manager.subscribe(['topic'])
+        revoke = consumer.subscribe.call_args[1]['on_revoke']
+        msg = message(0, 1)
+        manager.track(msg)
+        manager.done(msg)
+        revoke(consumer, [TopicPartition('topic', 0)])
+        self.assertEqual([(0, 2)], committed(consumer))
+        self.assertFalse(consumer.commit.call_args[1]['asynchronous'])
+        self.assertEqual([], manager.commit())
+
+    def test_close_commits_offsets_of_failed_asynchronous_commits(self):
+        consumer = mock.Mock()
+        manager = CommitManager(consumer, commit_every=1)
+        msg = message(0, 7)
+        manager.track(msg)
+        # the asynchronous commit is sent, its failure would only be reported to the consumer's on_commit
+        manager.done(msg)
+        self.assertTrue(consumer.commit.call_args[1]['asynchronous'])
+        manager.close()
+        self.assertEqual([(0, 8)], committed(consumer))
+        self.assertFalse(consumer.commit.call_args[1]['asynchronous'])
+
+    def test_idle_poll_commits_on_interval(self):
+        consumer = mock.Mock()
+        consumer.poll.return_value = None
+        manager = CommitManager(consumer, commit_every=100, commit_interval=0)
+        manager.poll(0)
+        consumer.commit.assert_not_called()
+        msg = message(0, 3)
+        manager.track(msg)
+        manager.commit_interval = 3600
+        manager.done(msg)
+        consumer.commit.assert_not_called()
+        manager.commit_interval = 0
+        manager.poll(0)
+        self.assertEqual([(0, 4)], committed(consumer))
+        self.assertTrue(consumer.commit.call_args[1]['asynchronous'])
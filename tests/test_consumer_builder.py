@@ -11,8 +11,19 @@
 # limitations under the License.
 
 import stream_registry_python_client.consumer.builder as cbuiler
+import stream_registry_python_client.restclient as restclient
 import unittest
 
+from unittest import mock
+
+
+def registration(topics, configuration=None):
+    stream_configuration = {'bootstrap.servers': 'localhost:9092',
+                            'schema.registry.url': 'http://localhost:8081'}
+    stream_configuration.update(configuration or {})
+    return {'regionStreamConfigList': [{'region': 'us-east-1', 'topics': topics,
+                                        'streamConfiguration': stream_configuration}]}
+
 
 class ConsumerTests(unittest.TestCase):
     registry_config = {'base_url': 'http://streamregistry-test.us-east-1-vpc-88394aef.slb-internal.test.aws.away.black',
@@ -50,4 +61,51 @@ class ConsumerTests(unittest.TestCase):
                 break
             print('Received message: {} at offset {}'.format(msg.value().decode('utf-8'), msg.offset()))
 
-        consumer.close()
\ No newline at end of file
+        consumer.close()
+
+
+class BulkConsumerTests(unittest.TestCase):
+    registry_config = {'base_url': 'http://localhost', 'region': 'us-east-1', 'app_name': 'blahblah'}
+
+    @mock.patch('stream_registry_python_client.consumer.builder.Consumer')
+    @mock.patch('stream_registry_python_client.restclient.register_consumer')
+    def test_managed_consumer_disables_auto_commit_over_the_registry(self, mock_register, mock_consumer):
+        mock_register.return_value = registration(['topic-one'], {'enable.auto.commit': 'true'})
+        c, topics, manager = cbuiler.create_managed_consumer(self.registry_config, 'one', avro_consumer=False,
+                                                             kafka_properties={'enable.auto.commit': True})
+        self.assertFalse(mock_consumer.call_args[0][0]['enable.auto.commit'])
+        self.assertIs(c, manager.consumer)
+        self.assertEqual(['topic-one'], c.subscribe.call_args[0][0])
+
+    @mock.patch('stream_registry_python_client.restclient.register_many')
+    def test_create_consumers(self, mock_register_many):
+        error = restclient.RegistrationError('boom')
+        mock_register_many.return_value = ({'one': registration(['topic-one'])}, {'two': error})
+        consumers, errors = cbuiler.create_consumers(self.registry_config, ['one', 'two'], avro_consumer=False,
+                                                     auto_subscribe=False)
+        self.assertEqual(['one'], list(consumers))
+        consumer, topics = consumers['one']
+        self.assertEqual(['topic-one'], topics)
+        self.assertEqual({'two': error}, errors)
+        consumer.close()
+
+    @mock.patch('stream_registry_python_client.restclient.register_many')
+    def test_create_multiplexed_consumers_groups_matching_configurations(self, mock_register_many):
+        mock_register_many.return_value = ({'one': registration(['topic-one']),
+                                            'two': registration(['topic-two']),
+                                            'three': registration(['topic-three'], {'bootstrap.servers': 'other:9092'})
+                                            }, {})
+        consumers, errors = cbuiler.create_multiplexed_consumers(self.registry_config, ['one', 'two', 'three'],
+                                                                 avro_consumer=False, auto_subscribe=False)
+        self.assertEqual({}, errors)
+        self.assertEqual([['one', 'two'], ['three']], sorted(sorted(c.streams) for c in consumers))
+        shared = [c for c in consumers if len(c.streams) == 2][0]
+        self.assertEqual(['topic-one', 'topic-two'], shared.topics)
+
+        msg = mock.Mock()
+        msg.topic.return_value = 'topic-two'
+        handler = mock.Mock(return_value='handled')
+        self.assertEqual('handled', shared.dispatch(msg, {'two': handler}))
+        handler.assert_called_once_with('two', msg)
+        for c in consumers:
+            c.close()
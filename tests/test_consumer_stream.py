@@ -0,0 +1,52 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from unittest import mock
+
+from stream_registry_python_client.consumer.stream import consume_batches
+
+
+def message(partition, offset, value=None, error=None):
+    msg = mock.Mock()
+    msg.topic.return_value = 'topic'
+    msg.partition.return_value = partition
+    msg.offset.return_value = offset
+    msg.value.return_value = value
+    msg.error.return_value = error
+    return msg
+
+
+class TestConsumeBatches(unittest.TestCase):
+
+    def test_batches_are_bounded_by_size(self):
+        consumer = mock.Mock()
+        consumer.consume.side_effect = [[message(0, 0), message(1, 0), message(0, 1)],
+                                        [message(1, 1), message(0, 2, error='eof')],
+                                        [], [message(0, 3)]]
+        batches = consume_batches(consumer, max_batch_size=5, max_wait=10)
+        first = next(batches)
+        self.assertEqual(4, len(first))
+        self.assertEqual(1, len(first.errors))
+        self.assertEqual([('topic', 0), ('topic', 1)], list(first.by_partition()))
+        self.assertEqual([0, 1], [m.offset() for m in first.by_partition()[('topic', 0)]])
+        self.assertEqual(2, consumer.consume.call_args_list[1][1]['num_messages'])
+
+    def test_batches_are_bounded_by_time_and_decoded(self):
+        consumer = mock.Mock()
+        consumer.consume.return_value = [message(0, 0, value=b'a')]
+        batches = consume_batches(consumer, max_batch_size=1000, max_wait=0.05,
+                                  decode=lambda msgs: [m.value().decode('utf-8') for m in msgs])
+        batch = next(batches)
+        self.assertGreater(len(batch), 0)
+        self.assertEqual(['a'] * len(batch), batch.decoded)
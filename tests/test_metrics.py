@@ -0,0 +1,127 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+import urllib.request
+
+from unittest import mock
+
+from stream_registry_python_client import metrics
+from stream_registry_python_client.consumer import builder as cbuilder
+from stream_registry_python_client.producer import builder as pbuilder
+from stream_registry_python_client.restclient import RegistryClient
+
+REGISTRY_CONFIG = {'base_url': 'http://localhost', 'region': 'someregion', 'app_name': 'someappname',
+                   'cache_ttl': 60, 'retries': 0}
+
+STATS = {
+    'name': 'rdkafka#producer-1', 'msg_cnt': 12, 'msg_size': 2048, 'replyq': 0,
+    'brokers': {
+        'localhost:9092/1': {'nodeid': 1, 'outbuf_cnt': 3, 'waitresp_cnt': 1,
+                             'rtt': {'cnt': 5, 'avg': 1500, 'p99': 4000}},
+        'GroupCoordinator': {'nodeid': -1, 'outbuf_cnt': 0, 'waitresp_cnt': 0, 'rtt': {'cnt': 0}},
+    },
+    'topics': {'orders': {'partitions': {
+        '0': {'msgq_cnt': 7, 'xmit_msgq_cnt': 2, 'consumer_lag': 42},
+        '-1': {'msgq_cnt': 1, 'xmit_msgq_cnt': 0, 'consumer_lag': -1},
+    }}},
+}
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.instrumentation = metrics.InMemoryInstrumentation()
+        metrics.set_instrumentation(self.instrumentation)
+
+    def tearDown(self):
+        metrics.set_instrumentation(None)
+
+    def test_timer_records_outcome(self):
+        with metrics.timer('step', stream='s'):
+            pass
+        with self.assertRaises(KeyError):
+            with metrics.timer('step', stream='s'):
+                raise KeyError('boom')
+        _, _, timings = self.instrumentation.snapshot()
+        self.assertEqual(1, timings[('step', (('outcome', 'success'), ('stream', 's')))][0])
+        self.assertEqual(1, timings[('step', (('outcome', 'error'), ('stream', 's')))][0])
+        self.assertEqual(1, self.instrumentation.counter('step.errors', stream='s'))
+
+    def test_librdkafka_statistics(self):
+        metrics.record_statistics(json.dumps(STATS))
+        _, gauges, _ = self.instrumentation.snapshot()
+        client = ('client', 'rdkafka#producer-1')
+        broker = (('broker', 'localhost:9092/1'), client)
+        partition = (client, ('partition', '0'), ('topic', 'orders'))
+        self.assertEqual(12, gauges[('kafka.queue.messages', (client,))])
+        self.assertEqual(0.0015, gauges[('kafka.broker.rtt_avg_seconds', broker)])
+        self.assertEqual(42, gauges[('kafka.partition.consumer_lag', partition)])
+        self.assertEqual(7, gauges[('kafka.partition.msgq', partition)])
+        self.assertFalse(any('GroupCoordinator' in str(key) or ('partition', '-1') in key[1] for key in gauges))
+
+        metrics.record_statistics('not json')
+
+    def test_apply_statistics(self):
+        self.assertEqual({'a': 1}, metrics.apply_statistics({'a': 1}, {}))
+        properties = metrics.apply_statistics({}, {'statistics_interval_ms': '1000'})
+        self.assertEqual(1000, properties['statistics.interval.ms'])
+        self.assertIs(metrics.record_statistics, properties['stats_cb'])
+
+    def test_prometheus_exporter(self):
+        self.instrumentation.increment('registry.failures', role='consumers', status=500)
+        self.instrumentation.gauge('kafka.partition.consumer_lag', 3, topic='a"b')
+        self.instrumentation.timing('registry.request', 0.5, role='consumers')
+        exporter = metrics.PrometheusExporter(self.instrumentation)
+        text = exporter.render()
+        self.assertIn('# TYPE stream_registry_registry_failures_total counter\n'
+                      'stream_registry_registry_failures_total{role="consumers",status="500"} 1\n', text)
+        self.assertIn('stream_registry_kafka_partition_consumer_lag{topic="a\\"b"} 3\n', text)
+        self.assertIn('stream_registry_registry_request_seconds_count{role="consumers"} 1\n', text)
+        self.assertIn('stream_registry_registry_request_seconds_sum{role="consumers"} 0.5\n', text)
+
+        server = exporter.serve(0, '127.0.0.1')
+        try:
+            url = 'http://127.0.0.1:{}/metrics'.format(server.server_address[1])
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(text, response.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @mock.patch('requests.Session.put')
+    def test_registry_calls_are_instrumented(self, mock_put):
+        mock_put.return_value.ok = True
+        mock_put.return_value.status_code = 200
+        mock_put.return_value.json.return_value = {'regionStreamConfigList': []}
+        with RegistryClient(REGISTRY_CONFIG) as registry:
+            registry.register_consumer('teststream')
+            registry.register_consumer('teststream')
+            mock_put.return_value.ok = False
+            mock_put.return_value.status_code = 400
+            registry.register_producer('teststream')
+
+        self.assertEqual(1, self.instrumentation.counter('registry.cache.hits', role='consumers'))
+        self.assertEqual(1, self.instrumentation.counter('registry.cache.misses', role='consumers'))
+        self.assertEqual(1, self.instrumentation.counter('registry.failures', role='producers', status=400))
+        _, _, timings = self.instrumentation.snapshot()
+        self.assertEqual(1, timings[('registry.request', (('outcome', 'success'), ('role', 'consumers')))][0])
+
+    @mock.patch('stream_registry_python_client.restclient.register_many')
+    def test_bulk_builders_are_timed(self, mock_register):
+        mock_register.return_value = ({}, {})
+        pbuilder.create_producers(REGISTRY_CONFIG, ['a', 'b'])
+        cbuilder.create_consumers(REGISTRY_CONFIG, ['a', 'b'])
+        _, _, timings = self.instrumentation.snapshot()
+        self.assertEqual(1, timings[('builder.create_producers', (('outcome', 'success'),))][0])
+        self.assertEqual(1, timings[('builder.create_consumers', (('outcome', 'success'),))][0])
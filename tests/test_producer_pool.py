@@ -0,0 +1,63 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import stream_registry_python_client.producer.builder as pbuilder
+import unittest
+
+from unittest import mock
+
+from stream_registry_python_client.producer.pool import ProducerPool, default_pool
+
+
+def registration(topic, servers='localhost:9092'):
+    return {'regionStreamConfigList': [{'region': 'us-east-1', 'topics': [topic],
+                                        'streamConfiguration': {'bootstrap.servers': servers,
+                                                                'schema.registry.url': 'http://localhost:8081'}}]}
+
+
+class TestProducerPool(unittest.TestCase):
+
+    def test_reference_counting(self):
+        factory = mock.Mock(side_effect=lambda props: mock.MagicMock(flush=mock.Mock(return_value=0)))
+        pool = ProducerPool()
+        first = pool.acquire({'bootstrap.servers': 'a'}, factory=factory)
+        second = pool.acquire({'bootstrap.servers': 'a'}, factory=factory)
+        other = pool.acquire({'bootstrap.servers': 'b'}, factory=factory)
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(2, len(pool))
+
+        first.__len__.return_value = 7
+        self.assertEqual(7, pool.release(first))
+        first.flush.assert_not_called()
+        first.close.assert_not_called()
+        self.assertEqual(0, pool.release(second))
+        first.flush.assert_called_once_with(30.0)
+        first.close.assert_called_once_with()
+        self.assertEqual(1, len(pool))
+        with self.assertRaises(ValueError):
+            pool.release(first)
+
+    @mock.patch('stream_registry_python_client.restclient.register_producer')
+    def test_shared_producers_from_builder(self, mock_register):
+        config = {'base_url': 'http://localhost', 'region': 'us-east-1', 'app_name': 'blahblah'}
+        mock_register.side_effect = [registration('topic-one'), registration('topic-two'),
+                                     registration('topic-three', servers='otherhost:9092')]
+        p1, topic1 = pbuilder.create_producer(config, 'one', shared=True)
+        p2, topic2 = pbuilder.create_producer(config, 'two', shared=True)
+        p3, _ = pbuilder.create_producer(config, 'three', shared=True)
+        self.assertEqual(('topic-one', 'topic-two'), (topic1, topic2))
+        self.assertIs(p1, p2)
+        self.assertIsNot(p1, p3)
+        for p in (p1, p2, p3):
+            pbuilder.release_producer(p, timeout=0)
+        self.assertEqual(0, len(default_pool))
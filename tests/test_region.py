@@ -0,0 +1,74 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import unittest
+
+from unittest import mock
+
+import stream_registry_python_client.region as region
+
+REGISTRATION = {'regionStreamConfigList': [
+    {'region': 'us-east-1', 'topics': ['east'], 'streamConfiguration': {'bootstrap.servers': 'east:9092'}},
+    {'region': 'eu-west-1', 'topics': ['west'], 'streamConfiguration': {'bootstrap.servers': 'west:9092'}},
+    {'region': 'ap-south-1', 'topics': ['south'], 'streamConfiguration': {'bootstrap.servers': 'south:9092'}},
+]}
+RTTS = {'east:9092': 0.2, 'west:9092': float('inf'), 'south:9092': 0.01}
+
+
+def regions(configs):
+    return [c['region'] for c in configs]
+
+
+class TestRegionSelection(unittest.TestCase):
+
+    def test_configured_region_is_preferred(self):
+        config = {'region': 'eu-west-1'}
+        self.assertEqual('eu-west-1', region.select_region_config(REGISTRATION, config)['region'])
+        self.assertEqual('us-east-1', region.select_region_config(REGISTRATION, {'region': 'nowhere'})['region'])
+        self.assertEqual('us-east-1', region.select_region_config(REGISTRATION, {'region': 'eu-west-1',
+                                                                                 'region_policy': 'first'})['region'])
+
+    def test_explicit_target_region(self):
+        config = {'region': 'eu-west-1', 'target_region': 'ap-south-1'}
+        self.assertEqual(['ap-south-1', 'eu-west-1', 'us-east-1'],
+                         regions(region.rank_region_configs(REGISTRATION, config)))
+
+    @mock.patch('stream_registry_python_client.region.probe_rtt', side_effect=lambda servers, *args: RTTS[servers])
+    def test_latency_policy_and_failover(self, mock_probe):
+        config = {'region_policy': 'latency'}
+        self.assertEqual(['ap-south-1', 'us-east-1', 'eu-west-1'],
+                         regions(region.rank_region_configs(REGISTRATION, config)))
+        config = {'region': 'eu-west-1', 'region_failover': True}
+        self.assertEqual('us-east-1', region.select_region_config(REGISTRATION, config)['region'])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            region.rank_region_configs(REGISTRATION, {'region_policy': 'random'})
+
+    def test_probe_rtt(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        self.addCleanup(listener.close)
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        servers = '127.0.0.1:{},127.0.0.1:{}'.format(closed_port, listener.getsockname()[1])
+        rtt = region.probe_rtt(servers, timeout=1)
+        self.assertLess(rtt, 1)
+        with mock.patch('socket.create_connection') as mock_connect:
+            self.assertEqual(rtt, region.probe_rtt(servers, timeout=1))
+            mock_connect.assert_not_called()
+        self.assertEqual(float('inf'), region.probe_rtt('127.0.0.1:{}'.format(closed_port), timeout=1))
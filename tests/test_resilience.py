@@ -0,0 +1,78 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import requests
+import time
+import unittest
+
+import stream_registry_python_client.restclient as restclient
+from benchmarks.registry import StandInRegistry
+from stream_registry_python_client.resilience import CircuitOpenError, RetryPolicy
+
+
+def topics(registration):
+    return registration['regionStreamConfigList'][0]['topics']
+
+
+class TestResilience(unittest.TestCase):
+
+    def start_registry(self, script):
+        server = StandInRegistry(script=script)
+        self.addCleanup(server.close)
+        return server
+
+    def client(self, server, **settings):
+        config = {'base_url': server.base_url, 'region': 'someregion', 'app_name': 'someappname',
+                  'backoff_base': 0.01}
+        config.update(settings)
+        client = restclient.RegistryClient(config)
+        self.addCleanup(client.close)
+        return client
+
+    def test_retries_on_unavailable(self):
+        server = self.start_registry([(503, 0), (503, 0), (200, 0)])
+        self.assertEqual(['s'], topics(self.client(server).register_consumer('s')))
+        self.assertEqual(3, server.calls)
+
+    def test_gives_up_after_retries(self):
+        server = self.start_registry([(503, 0)])
+        self.assertIsNone(self.client(server, retries=1).register_consumer('s'))
+        self.assertEqual(2, server.calls)
+
+    def test_circuit_breaker_fails_fast(self):
+        server = self.start_registry([(500, 0)])
+        client = self.client(server, retries=0, circuit_failure_threshold=2)
+        client.register_consumer('s')
+        client.register_consumer('s')
+        with self.assertRaises(CircuitOpenError):
+            client.register_consumer('s')
+        self.assertEqual(2, server.calls)
+
+    def test_deadline(self):
+        server = self.start_registry([(200, 2)])
+        start = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            self.client(server, retries=0, deadline=0.3).register_consumer('s')
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_hedged_request_wins(self):
+        server = self.start_registry([(200, 2), (200, 0)])
+        start = time.monotonic()
+        client = self.client(server, hedge_percentile=95, hedge_delay=0.1)
+        self.assertEqual(['s'], topics(client.register_consumer('s')))
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(2, server.calls)
+
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(retries=10, backoff_base=0.1, backoff_max=1.0)
+        for attempt in range(10):
+            self.assertLessEqual(policy.delay(attempt), 1.0)
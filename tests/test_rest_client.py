@@ -11,7 +11,10 @@
 # limitations under the License.
 
 # -*- coding: utf-8 -*-
+import asyncio
+import requests
 import stream_registry_python_client.restclient as restclient
+import tempfile
 import unittest
 
 from unittest import mock
@@ -34,7 +37,7 @@ class TestStreamRegistryClient (unittest.TestCase):
                                           'app_name': 'someappname'
                                           }, None)
 
-    @mock.patch('requests.put')
+    @mock.patch('requests.Session.put')
     def test_register_producer_service_down(self, mock_put):
         mock_resp = mock.Mock()
         mock_resp.ok = False
@@ -43,4 +46,83 @@ class TestStreamRegistryClient (unittest.TestCase):
                                       'region': 'someregion',
                                       'app_name': 'someappname'
                                       }, 'testapp')
-        self.assertIsNone(producer_data)
\ No newline at end of file
+        self.assertIsNone(producer_data)
+
+    @mock.patch('requests.Session.put')
+    def test_register_consumer_url_and_timeout(self, mock_put):
+        mock_resp = mock.Mock()
+        mock_resp.ok = True
+        mock_resp.json.return_value = {'regionStreamConfigList': []}
+        mock_put.return_value = mock_resp
+        client = restclient.RegistryClient({'base_url': 'http://localhost',
+                                            'region': 'someregion',
+                                            'app_name': 'someappname',
+                                            'read_timeout': 2
+                                            })
+        self.assertEqual({'regionStreamConfigList': []}, client.register_consumer('teststream'))
+        mock_put.assert_called_once_with('http://localhost/v0/streams/teststream/consumers/someappname/regions/someregion',
+                                         timeout=(5.0, 2.0))
+
+    def test_get_client_is_shared(self):
+        config = {'base_url': 'http://localhost', 'region': 'someregion', 'app_name': 'someappname'}
+        self.assertIs(restclient.get_client(config), restclient.get_client(dict(config)))
+        self.assertIsNot(restclient.get_client(config),
+                         restclient.get_client(dict(config, app_name='otherapp')))
+
+    @mock.patch('requests.Session.put')
+    def test_async_register_producer(self, mock_put):
+        mock_resp = mock.Mock()
+        mock_resp.ok = True
+        mock_resp.json.return_value = {'regionStreamConfigList': []}
+        mock_put.return_value = mock_resp
+        client = restclient.AsyncRegistryClient({'base_url': 'http://localhost',
+                                                 'region': 'someregion',
+                                                 'app_name': 'someappname'
+                                                 })
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(client.register_producer('teststream'))
+        finally:
+            client.close()
+            loop.close()
+        self.assertEqual({'regionStreamConfigList': []}, result)
+        self.assertIn('/producers/someappname/', mock_put.call_args[0][0])
+
+    @mock.patch('requests.Session.put')
+    def test_register_many_reports_per_stream_errors(self, mock_put):
+        def respond(url, timeout=None):
+            resp = mock.Mock()
+            resp.ok = '/streams/bad/' not in url
+            resp.json.return_value = {'url': url}
+            return resp
+        mock_put.side_effect = respond
+        results, errors = restclient.register_many({'base_url': 'http://localhost',
+                                                    'region': 'someregion',
+                                                    'app_name': 'someappname'
+                                                    }, ['one', 'bad', 'two'], restclient.PRODUCER_ROLE, max_workers=2)
+        self.assertEqual(['one', 'two'], sorted(results))
+        self.assertIn('/producers/', results['one']['url'])
+        self.assertEqual(['bad'], list(errors))
+        self.assertIsInstance(errors['bad'], restclient.RegistrationError)
+
+    @mock.patch('requests.Session.put')
+    def test_cache_serves_fresh_and_stale_registrations(self, mock_put):
+        mock_resp = mock.Mock()
+        mock_resp.ok = True
+        mock_resp.json.return_value = {'regionStreamConfigList': []}
+        mock_put.return_value = mock_resp
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = {'base_url': 'http://localhost', 'region': 'someregion', 'app_name': 'someappname',
+                      'cache_dir': cache_dir, 'cache_ttl': 0, 'retries': 0}
+            self.assertEqual({'regionStreamConfigList': []}, restclient.RegistryClient(config).register_consumer('s'))
+
+            mock_put.side_effect = requests.ConnectionError('registry is down')
+            restarted = restclient.RegistryClient(config)
+            self.assertEqual({'regionStreamConfigList': []}, restarted.register_consumer('s'))
+            with self.assertRaises(requests.ConnectionError):
+                restarted.register_producer('s')
+
+            mock_put.side_effect = None
+            restarted = restclient.RegistryClient(dict(config, cache_ttl=60))
+            restarted.register_consumer('s')
+            self.assertEqual(3, mock_put.call_count)
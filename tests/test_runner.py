@@ -0,0 +1,112 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import multiprocessing
+import queue
+import threading
+import unittest
+
+from unittest import mock
+
+from stream_registry_python_client.consumer.commit import CommitManager
+from stream_registry_python_client.consumer.runner import ConsumerGroupRunner, main
+
+REGISTRY_CONFIG = {'base_url': 'http://localhost', 'region': 'us-east-1', 'app_name': 'blahblah'}
+
+
+class FakeConsumer(object):
+    """Returns the given values once, then nothing, and reports the committed offsets to a queue"""
+
+    def __init__(self, values, commits):
+        self.values = list(values)
+        self.commits = commits
+        self.offset = 0
+
+    def poll(self, timeout):
+        if not self.values:
+            return None
+        msg = mock.Mock()
+        msg.error.return_value = None
+        msg.value.return_value = self.values.pop(0)
+        msg.topic.return_value = 'topic'
+        msg.partition.return_value = 0
+        msg.offset.return_value = self.offset
+        self.offset += 1
+        return msg
+
+    def commit(self, offsets=None, asynchronous=True):
+        for tp in offsets or []:
+            self.commits.put(tp.offset)
+
+    def close(self):
+        pass
+
+
+def managed(values, commits):
+    consumer = FakeConsumer(values, commits)
+    return consumer, ['topic'], CommitManager(consumer, commit_every=1)
+
+
+def committed(commits):
+    offsets = []
+    while True:
+        try:
+            offsets.append(commits.get(timeout=0.5))
+        except queue.Empty:
+            return offsets
+
+
+def handle(msg):
+    if msg.value() == b'crash':
+        raise RuntimeError('handler failure')
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == 'fork', "the builder is mocked in forked workers")
+class TestConsumerGroupRunner(unittest.TestCase):
+
+    def run_for(self, runner, seconds):
+        threading.Timer(seconds, runner.stop).start()
+        return runner.run(shutdown_timeout=5)
+
+    @mock.patch('stream_registry_python_client.consumer.builder.create_managed_consumer')
+    def test_workers_share_the_load(self, mock_create):
+        commits = multiprocessing.Queue()
+        mock_create.side_effect = lambda *args, **kwargs: managed([b'a'] * 5, commits)
+        runner = ConsumerGroupRunner(REGISTRY_CONFIG, 'TestStream', handle, workers=2, poll_timeout=0.01,
+                                     restart_delay=0.05, report_interval=0.2)
+        self.assertEqual(10, self.run_for(runner, 1.0))
+        self.assertEqual(0, runner.restarts)
+        # every worker commits each handled message, then its last offset again synchronously when it stops
+        self.assertEqual([1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 5, 5], sorted(committed(commits)))
+
+    @mock.patch('stream_registry_python_client.consumer.builder.create_managed_consumer')
+    def test_crashed_workers_are_restarted(self, mock_create):
+        commits = multiprocessing.Queue()
+        mock_create.side_effect = lambda *args, **kwargs: managed([b'a', b'crash'], commits)
+        runner = ConsumerGroupRunner(REGISTRY_CONFIG, 'TestStream', handle, workers=1, poll_timeout=0.01,
+                                     restart_delay=0.05)
+        processed = self.run_for(runner, 1.0)
+        self.assertGreaterEqual(runner.restarts, 1)
+        self.assertGreaterEqual(processed, 2)
+        # the message that crashed the handler (offset 1) is never committed
+        self.assertEqual({1}, set(committed(commits)))
+
+
+class TestMain(unittest.TestCase):
+
+    @mock.patch('stream_registry_python_client.consumer.runner.ConsumerGroupRunner')
+    def test_arguments(self, mock_runner):
+        main(['--base-url', 'http://localhost', '--region', 'us-east-1', '--app-name', 'blahblah', '--stream',
+              'TestStream', '--handler', 'json:loads', '--workers', '3', '--no-avro'])
+        mock_runner.assert_called_once_with(REGISTRY_CONFIG, 'TestStream', json.loads, workers=3, avro_consumer=False)
+        mock_runner.return_value.run.assert_called_once_with()
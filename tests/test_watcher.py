@@ -0,0 +1,98 @@
+# Copyright (c) 2018 Expedia Group.
+# All rights reserved.  http://www.homeaway.com
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from unittest import mock
+
+import stream_registry_python_client.consumer.builder as cbuilder
+from stream_registry_python_client.watcher import TopologyWatcher, default_watcher
+
+REGISTRY_CONFIG = {'base_url': 'http://localhost', 'region': 'us-east-1', 'app_name': 'watcher-tests'}
+
+
+def registration(topics, configuration=None):
+    return {'regionStreamConfigList': [{'region': 'us-east-1', 'topics': topics,
+                                        'streamConfiguration': configuration or {'bootstrap.servers': 'b:9092'}}]}
+
+
+def response(status, body=None, etag=None):
+    resp = mock.Mock()
+    resp.status_code = status
+    resp.ok = status < 400
+    resp.json.return_value = body
+    resp.headers = {'ETag': etag} if etag else {}
+    return resp
+
+
+class TestTopologyWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.watcher = TopologyWatcher(interval=3600)
+        self.addCleanup(self.watcher.stop)
+
+    @mock.patch('requests.Session.put')
+    def test_resubscribes_only_when_topics_change(self, mock_put):
+        consumer = mock.Mock()
+        on_change = mock.Mock()
+        self.watcher.watch_consumer(consumer, REGISTRY_CONFIG, 'stream', registration(['t1']), on_change=on_change)
+        self.watcher.watch_consumer(mock.Mock(), REGISTRY_CONFIG, 'stream', registration(['t1']))
+
+        mock_put.return_value = response(200, registration(['t1']), etag='v1')
+        self.assertEqual([], self.watcher.refresh())
+        consumer.subscribe.assert_not_called()
+
+        mock_put.return_value = response(304)
+        self.assertEqual([], self.watcher.refresh())
+        self.assertEqual({'If-None-Match': 'v1'}, mock_put.call_args[1]['headers'])
+
+        mock_put.return_value = response(412)
+        self.assertEqual([], self.watcher.refresh())
+        self.assertEqual({'If-None-Match': 'v1'}, mock_put.call_args[1]['headers'])
+
+        mock_put.return_value = response(200, registration(['t1', 't2']), etag='v2')
+        changes = self.watcher.refresh()
+        self.assertEqual(['t2'], changes[0].added_topics)
+        consumer.subscribe.assert_called_once_with(['t1', 't2'])
+        on_change.assert_called_once_with(changes[0])
+        self.assertEqual(4, mock_put.call_count)
+
+    @mock.patch('requests.Session.put')
+    def test_configuration_change_is_reported_without_resubscribing(self, mock_put):
+        consumer = mock.Mock()
+        on_change = mock.Mock()
+        watch = self.watcher.watch_consumer(consumer, REGISTRY_CONFIG, 'other', registration(['t1']),
+                                            on_change=on_change)
+        mock_put.return_value = response(200, registration(['t1'], {'bootstrap.servers': 'c:9092'}))
+        change = self.watcher.refresh()[0]
+        self.assertTrue(change.configuration_changed)
+        consumer.subscribe.assert_not_called()
+        on_change.assert_called_once_with(change)
+
+        self.watcher.unwatch(watch)
+        self.assertEqual([], self.watcher.refresh())
+
+    @mock.patch('stream_registry_python_client.consumer.builder.Consumer')
+    @mock.patch('stream_registry_python_client.restclient.register_consumer')
+    @mock.patch('requests.Session.put')
+    def test_closing_a_watched_consumer_stops_watching(self, mock_put, mock_register, mock_consumer):
+        properties = {'bootstrap.servers': 'b:9092', 'schema.registry.url': 'http://localhost:8081'}
+        mock_register.return_value = registration(['t1'], properties)
+        c, topics = cbuilder.create_consumer(REGISTRY_CONFIG, 'closed', avro_consumer=False, watch_topology=True)
+        self.addCleanup(default_watcher.stop)
+        self.assertIs(mock_consumer.return_value.subscribe, c.subscribe)
+
+        c.close()
+        mock_consumer.return_value.close.assert_called_once_with()
+        mock_put.return_value = response(200, registration(['t1', 't2']))
+        self.assertEqual([], default_watcher.refresh())
+        mock_put.assert_not_called()